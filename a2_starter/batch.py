@@ -0,0 +1,224 @@
+# Assignment 2 - Puzzle Game
+#
+# CSC148 Summer 2017, University of Toronto
+# ---------------------------------------------
+"""Batch solving module.
+
+Solve many puzzles from a file (or standard input) on a pool of worker
+processes, and report each result with its timing.
+
+Each input line is one puzzle:
+    - a Sudoku grid of 16, 81, 256 or 625 characters, read top-down,
+      left-to-right. An empty cell is '.', '0', '_' or '-'. A filled cell
+      is a letter, or a digit 1-9 standing for the letters A-I.
+    - a word ladder, as its start and target words separated by spaces.
+Blank lines and lines starting with '#' are skipped.
+
+Each output line has, separated by tabs: the line number of the puzzle,
+'solved', 'unsolvable' or 'error', the time taken in milliseconds, and
+the solution (the grid in one line, or the words of the ladder) or the
+error message. A summary with the number of puzzles per second is
+printed to standard error at the end.
+
+With --index, word ladders use a ladder index precomputed by
+ladder_index.py, so ladders between unconnected words fail at once.
+
+Usage:
+    python batch.py puzzles.txt -o results.txt -w 8
+    python batch.py ladders.txt --index wordsEn.json
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+from solver import solve
+from sudoku_puzzle import SudokuPuzzle, CHARS
+from word_ladder_puzzle import WordLadderPuzzle, WordDictionary, WORDS_FILE
+from ladder_index import LadderIndex
+
+BLANKS = '.0_-'
+
+
+def parse_puzzle(line, words_file=WORDS_FILE, index_file=None):
+    """Return the puzzle described by one input line.
+
+    Raise a ValueError if <line> describes no puzzle.
+
+    Word ladders use the shared dictionary of <words_file>. If
+    <index_file> is given, the ladder index saved in it is loaded into
+    that dictionary the first time it is needed in this process.
+
+    @type line: str
+    @type words_file: str
+    @type index_file: str | None
+    @rtype: Puzzle
+
+    >>> print(parse_puzzle('AB.D..BA...B....'))
+      01|23
+     ------
+    0|AB| D
+    1|  |BA
+     ------
+    2|  | B
+    3|  |
+    <BLANKLINE>
+    >>> print(parse_puzzle('cold warm'))
+    cold
+    >>> parse_puzzle('AB.D')
+    Traceback (most recent call last):
+    ...
+    ValueError: Unrecognized puzzle!
+    """
+    parts = line.split()
+    # if it is two words, it is a word ladder
+    if len(parts) == 2:
+        dictionary = WordDictionary.shared(words_file)
+        if index_file is not None and dictionary.ladder_index() is None:
+            dictionary.set_ladder_index(LadderIndex.load(index_file))
+        return WordLadderPuzzle(parts[0], parts[1], dictionary=dictionary)
+    # otherwise it must be a whole Sudoku grid
+    if len(parts) != 1:
+        raise ValueError('Unrecognized puzzle!')
+    cells = parts[0]
+    n = int(round(sqrt(len(cells))))
+    if n not in (4, 9, 16, 25) or n * n != len(cells):
+        raise ValueError('Unrecognized puzzle!')
+    grid = []
+    for i in range(n):
+        row = []
+        for cell in cells[i * n:(i + 1) * n]:
+            if cell in BLANKS:
+                row.append('')
+            elif cell.isdigit():
+                row.append(CHARS[int(cell) - 1])
+            else:
+                row.append(cell.upper())
+            if row[-1] not in ('',) + tuple(CHARS[:n]):
+                raise ValueError('Unrecognized letter!')
+        grid.append(row)
+    return SudokuPuzzle(grid, 'mrv', True)
+
+
+def format_solution(puzzle):
+    """Return a solved puzzle in the one-line format of the output.
+
+    @type puzzle: Puzzle
+    @rtype: str
+
+    >>> format_solution(parse_puzzle('ABCDCDABBADCDC..').direct_solve())
+    'ABCDCDABBADCDCBA'
+    >>> format_solution(parse_puzzle('cold cord'))
+    'cold'
+    """
+    if isinstance(puzzle, SudokuPuzzle):
+        return ''.join(''.join(row) for row in puzzle.to_data()['grid'])
+    return str(puzzle)
+
+
+def solve_line(line, words_file=WORDS_FILE, index_file=None):
+    """Solve the puzzle described by one input line.
+
+    Return whether it was 'solved', 'unsolvable' or an 'error', the time
+    taken in seconds, and the solution or the error message.
+
+    @type line: str
+    @type words_file: str
+    @type index_file: str | None
+    @rtype: (str, float, str)
+
+    >>> solve_line('ABCDCDABBADCDC..')[::2]
+    ('solved', 'ABCDCDABBADCDCBA')
+    >>> solve_line('AACDCDABBADCDC..')[::2]
+    ('unsolvable', '')
+    >>> solve_line('x')[::2]
+    ('error', 'Unrecognized puzzle!')
+    >>> solve_line('mare care', 'missing.txt')[0]
+    'error'
+    """
+    start = time.perf_counter()
+    # a bad line, or a failure while solving it, is reported on its own
+    # line rather than ending the whole batch
+    try:
+        puzzle = parse_puzzle(line, words_file, index_file)
+        solution = solve(puzzle, direct=True)
+    except Exception as e:
+        return 'error', time.perf_counter() - start, str(e)
+    seconds = time.perf_counter() - start
+    if solution is None:
+        return 'unsolvable', seconds, ''
+    return 'solved', seconds, format_solution(solution)
+
+
+def run(lines, out, workers=None, words_file=WORDS_FILE, index_file=None):
+    """Solve the puzzles of <lines> and write the results to <out>.
+
+    Return the number of puzzles and the total time taken in seconds.
+
+    @type lines: iterable[str]
+    @type out: io.TextIOBase
+    @type workers: int | None
+    @type words_file: str
+    @type index_file: str | None
+    @rtype: (int, float)
+
+    >>> import io
+    >>> out = io.StringIO()
+    >>> run(['# grids', '  # indented', 'ABCDCDABBADCDC..'], out, 1)[0]
+    1
+    >>> out.getvalue().split()[:2]
+    ['3', 'solved']
+    """
+    puzzles = [(number, line.strip()) for number, line in enumerate(lines, 1)
+               if line.strip() and not line.strip().startswith('#')]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        results = executor.map(solve_line, [line for _, line in puzzles],
+                               [words_file] * len(puzzles),
+                               [index_file] * len(puzzles),
+                               chunksize=max(1, len(puzzles) // 64))
+        for (number, _), (status, seconds, text) in zip(puzzles, results):
+            out.write('{}\t{}\t{:.3f}\t{}\n'.format(
+                number, status, seconds * 1000, text))
+            out.flush()
+    return len(puzzles), time.perf_counter() - start
+
+
+def main(argv=None):
+    """Run the batch solver with the command line arguments <argv>.
+
+    @type argv: list[str] | None
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description='Solve many Sudoku and word ladder puzzles.')
+    parser.add_argument('input', nargs='?', default='-',
+                        help='file of puzzles, one per line (default: stdin)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the results to (default: stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: cores)')
+    parser.add_argument('--words', default=WORDS_FILE,
+                        help='word list for word ladders')
+    parser.add_argument('--index', default=None,
+                        help='ladder index of the word list, from '
+                             'ladder_index.py')
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.input == '-' else open(args.input)
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        count, seconds = run(infile, outfile, args.workers, args.words,
+                             args.index)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    rate = count / seconds if seconds > 0 else 0.0
+    print('{} puzzles in {:.3f} s ({:.1f} puzzles/s)'.format(
+        count, seconds, rate), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# Assignment 2 - Puzzle Game
+#
+# CSC148 Summer 2017, University of Toronto
+# ---------------------------------------------
+"""Benchmark module.
+
+Time the hot paths of the puzzles and the solver on a fixed set of
+puzzles, and print the results as JSON so that runs on different commits
+can be compared.
+
+Every benchmark runs its operation <number> times per round, for
+<repeat> rounds, and reports the best and the median time per call.
+<number> is chosen once per benchmark so that a round takes about
+--min-time seconds.
+
+Usage:
+    python benchmark.py -o before.json
+    ... change the code ...
+    python benchmark.py -o after.json --compare before.json
+    python benchmark.py --filter sudoku-9 --repeat 3
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from solver import solve, solve_complete, solve_best_first, hint_by_depth
+from sudoku_puzzle import SudokuPuzzle, CHARS
+from word_ladder_puzzle import WordLadderPuzzle, WordDictionary
+
+
+def sudoku_from_line(line, branching='first', propagate=False):
+    """Return the Sudoku puzzle of a one-line grid, with '.' for blanks.
+
+    @type line: str
+    @type branching: str
+    @type propagate: bool
+    @rtype: SudokuPuzzle
+    """
+    n = int(len(line) ** 0.5)
+    return SudokuPuzzle([['' if c == '.' else c for c in line[i:i + n]]
+                         for i in range(0, n * n, n)], branching, propagate)
+
+
+def sixteen(filled, seed):
+    """Return a line for a 16-by-16 grid with a fraction <filled> of the
+    cells of a fixed solution kept, chosen with random <seed>.
+
+    @type filled: float
+    @type seed: int
+    @rtype: str
+    """
+    rng = random.Random(seed)
+    return ''.join(CHARS[(4 * (r % 4) + r // 4 + c) % 16]
+                   if rng.random() < filled else '.'
+                   for r in range(16) for c in range(16))
+
+
+# The puzzles benchmarked, by case name
+SUDOKU = {
+    'sudoku-4-easy': 'AB.DCD.BBA.CDC..',
+    'sudoku-4-hard': 'A...............',
+    'sudoku-9-easy': 'EC..G....F..AIE....IH....F.H...F...CD..H.C..AG...B...F'
+                     '.F....BH....DAI..E....H..GI',
+    'sudoku-9-hard': 'H..........CF......G..I.B...E...G.......DEG.....A...C.'
+                     '..A....FH..HE...A..I....D..',
+    'sudoku-16': sixteen(0.55, 2),
+}
+LADDERS = {
+    'ladder-short': ('mare', 'mire'),
+    'ladder-long': ('cold', 'warm'),
+}
+
+
+def benchmarks():
+    """Return the benchmarks, as (name, case, operation) triples.
+
+    Each operation is a function of no arguments. Puzzles are created
+    beforehand, so only the operation itself is timed.
+
+    @rtype: list[(str, str, function)]
+    """
+    result = []
+    for case, line in sorted(SUDOKU.items()):
+        puzzle = sudoku_from_line(line)
+        # The generic search needs help on the larger boards
+        fast = sudoku_from_line(line, 'mrv', True)
+        searched = puzzle if case.startswith('sudoku-4') else fast
+        cell = puzzle._first_empty_cell()
+        solved = puzzle.direct_solve()
+        result += [
+            ('extensions', case, puzzle.extensions),
+            ('extensions-mrv', case, fast.extensions),
+            ('is_solved', case, solved.is_solved),
+            ('_possible_letters', case,
+             lambda p=puzzle, c=cell: p._possible_letters(*c)),
+            ('solve', case, lambda p=searched: solve(p)),
+            ('direct_solve', case, puzzle.direct_solve),
+        ]
+        if case != 'sudoku-16':
+            result += [
+                ('solve_complete', case, lambda p=searched: solve_complete(p)),
+                ('hint_by_depth', case,
+                 lambda p=puzzle: hint_by_depth(p, 2)),
+            ]
+    dictionary = WordDictionary.shared()
+    for case, (start, target) in sorted(LADDERS.items()):
+        puzzle = WordLadderPuzzle(start, target, dictionary=dictionary)
+        result += [
+            ('WordLadderPuzzle', case,
+             lambda s=start, t=target: WordLadderPuzzle(s, t)),
+            ('_possible_words', case, puzzle._possible_words),
+            ('extensions', case, puzzle.extensions),
+            ('solve', case, lambda p=puzzle: solve(p)),
+            ('direct_solve', case, puzzle.direct_solve),
+            ('solve_best_first', case, lambda p=puzzle: solve_best_first(p)),
+            ('hint_by_depth', case, lambda p=puzzle: hint_by_depth(p, 2)),
+        ]
+    # Every ladder of the full dictionary is far too many to enumerate
+    small = WordDictionary('wordsEnTest.txt')
+    result.append(('solve_complete', 'ladder-test-words',
+                   lambda: solve_complete(WordLadderPuzzle(
+                       'mare', 'mire', dictionary=small))))
+    return result
+
+
+def measure(operation, repeat, min_time):
+    """Return the number of calls per round and the time per call of
+    each round.
+
+    @type operation: function
+    @type repeat: int
+    @type min_time: float
+    @rtype: (int, list[float])
+    """
+    # One untimed call first, so that lazy set-up such as loading the
+    # dictionary is not timed
+    operation()
+    # Find how many calls take at least <min_time>
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    # The calibration rounds are not kept as samples
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        times.append((time.perf_counter() - start) / number)
+    return number, times
+
+
+def run(name_filter='', repeat=5, min_time=0.2, out=sys.stderr):
+    """Run the benchmarks whose "name/case" contains <name_filter>.
+
+    Report progress to <out>. Return the results, ready to be saved
+    as JSON.
+
+    @type name_filter: str
+    @type repeat: int
+    @type min_time: float
+    @type out: io.TextIOBase
+    @rtype: dict
+    """
+    results = []
+    for name, case, operation in benchmarks():
+        if name_filter not in '{}/{}'.format(name, case):
+            continue
+        number, times = measure(operation, repeat, min_time)
+        ordered = sorted(times)
+        results.append({'name': name, 'case': case, 'number': number,
+                        'repeat': repeat, 'best': ordered[0],
+                        'median': ordered[len(ordered) // 2]})
+        print('{:<20} {:<15} {:>12.1f} us'.format(
+            name, case, ordered[0] * 1e6), file=out)
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results}
+
+
+def compare(old, new, out=sys.stderr):
+    """Report how the best times of <new> compare to those of <old>.
+
+    @type old: dict
+    @type new: dict
+    @type out: io.TextIOBase
+    @rtype: None
+    """
+    before = {(r['name'], r['case']): r['best'] for r in old['results']}
+    for r in new['results']:
+        key = (r['name'], r['case'])
+        if key in before:
+            print('{:<20} {:<15} {:>7.2f}x'.format(
+                r['name'], r['case'], before[key] / r['best']), file=out)
+
+
+def main(argv=None):
+    """Run the benchmarks with the command line arguments <argv>.
+
+    @type argv: list[str] | None
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the puzzles and the solver.')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the JSON results to')
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks whose name/case has this')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='rounds per benchmark (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per round (default: 0.2)')
+    parser.add_argument('--compare', default=None,
+                        help='earlier JSON results to report speedups over')
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat, args.min_time)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    text = json.dumps(results, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
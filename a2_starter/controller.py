@@ -3,9 +3,19 @@
 # CSC148 Summer 2017, University of Toronto
 # ---------------------------------------------
 """Module containing the Controller class."""
+from time import perf_counter
 from view import TextView, WebView
 from puzzle import Puzzle
-from solver import solve, solve_complete, hint_by_depth
+from solver import solve, iter_solutions, hint_by_depth, SearchStats
+from solver import SearchInterrupted, TranspositionTable, SolveJob
+from solver import parallel_solve, parallel_solve_complete
+
+# The default number of seconds a solver command may search for
+SEARCH_TIME_LIMIT = 10
+
+# The number of entries each game's hint table keeps; a web server may
+# hold many games at once, so this is far below the solver's default
+HINT_TABLE_SIZE = 4096
 
 
 class MoveTreeCore:
@@ -18,8 +28,11 @@ class MoveTreeCore:
     #     The move player made
     # @type _parent: MoveTreeCore
     #     The parent node
-    # @type _children: list<MoveTreeCore>
-    #     The child nodes
+    # @type _children: dict<str, MoveTreeCore>
+    #     The child nodes by the normalized key of their move (see
+    #     _move_key), in the order the moves were first made
+    # @type _text: str | None
+    #     The string of _state, once it has been needed
     """
 
     def __init__(self, state, move='', parent=None):
@@ -36,8 +49,10 @@ class MoveTreeCore:
         self._move = move
         # initialize the parent
         self._parent = parent
-        # initialize the children as an empty list
-        self._children = []
+        # initialize the children as an empty dict
+        self._children = {}
+        # the string of the state is made when it is first needed
+        self._text = None
 
     def do(self, state, move):
         """Return a node advanced by the specified move
@@ -46,16 +61,13 @@ class MoveTreeCore:
         @type mode: str
         @rtype: MoveTreeCore
         """
-        # loop the children of the tree with index and element
-        for i, child in enumerate(self._children):
-            # if the move is equal to the child's move
-            if move == child._move:
-                # return the matched index of children
-                return self._children[i]
-        # create a tree as the child
-        child = MoveTreeCore(state, move, self)
-        # append the new child to the children list
-        self._children.append(child)
+        key = _move_key(move)
+        # if the move has been made here before, return its node
+        child = self._children.get(key)
+        if child is None:
+            # create a tree as the child, and record it under its move
+            child = MoveTreeCore(state, move, self)
+            self._children[key] = child
         return child
 
     def undo(self):
@@ -72,11 +84,35 @@ class MoveTreeCore:
         """Return child nodes if there are any otherwise None
 
         @type self: MoveTreeCore
-        @rtype: MoveTreeCore | None
+        @rtype: list[MoveTreeCore] | None
         """
         # if the children exist
         if self._children:
-            return self._children
+            return list(self._children.values())
+
+    def text(self):
+        """Return the string of the state of this node, made only once
+
+        @type self: MoveTreeCore
+        @rtype: str
+        """
+        if self._text is None:
+            self._text = str(self._state)
+        return self._text
+
+
+def _move_key(move):
+    """Return the key of <move> among the moves made from one state.
+
+    Moves which differ only in whitespace are the same move.
+
+    @type move: str
+    @rtype: str
+
+    >>> _move_key('(0, 1) -> B') == _move_key('(0,1)->B')
+    True
+    """
+    return ''.join(move.split())
 
 
 class MoveTree:
@@ -119,7 +155,7 @@ class MoveTree:
             # define the movetreecore with x
             self._movetreecore = x
             # return the string of state and the state after undo the tree
-            return str(x._state), x._state
+            return x.text(), x._state
         # else return the message and the state
         return 'No steps to undo!', self._movetreecore._state
 
@@ -138,7 +174,7 @@ class MoveTree:
             # loop the xs
             for x in xs:
                 # append the move and the current state of x
-                result.append(x._move + '\n' + str(x._state))
+                result.append(x._move + '\n' + x.text())
             return '\n'.join(result)
         # otherwise no attempts found
         return 'No attemps found!'
@@ -153,33 +189,100 @@ class Controller:
     # === Private Attributes ===
     # @type _puzzle: Puzzle
     #     The puzzle associated with this game controller
-    # @type _view: View
-    #     The view associated with this game controller
-
-    def __init__(self, puzzle, mode='text'):
+    # @type _start: Puzzle
+    #     The puzzle the game started with
+    # @type _view: View | None
+    #     The view associated with this game controller, if any
+    # @type _executor: concurrent.futures.Executor | None
+    #     Where ':SOLVE' and ':HINT' run their searches, or None to run
+    #     them here
+    # @type _workers: int | None
+    #     The number of processes ':SOLVE' and ':SOLVE-ALL' split their
+    #     search across, or None to search in one
+    # @type _time_limit: float | None
+    #     The number of seconds a search may take, or None for no limit
+    # @type _hints: TranspositionTable | None
+    #     What the searches for hints learned, kept for the next hints;
+    #     None if the puzzle has no 'key' to store states under
+    # @type _last_search: str | None
+    #     What the last ':SOLVE' or ':HINT' search did, with its
+    #     statistics, for ':STATS'; None before the first one
+
+    def __init__(self, puzzle, mode='text', time_limit=SEARCH_TIME_LIMIT,
+                 executor=None, workers=None):
         """Create a new controller.
 
         <mode> is either 'text' or 'web', representing the type of view
-        to use.
+        to use, or None for no view: the game is then played by calling
+        'act' directly.
 
         By default, <mode> has a value of 'text'.
 
+        The searches run by ':SOLVE', ':SOLVE-ALL' and ':HINT' give up
+        after <time_limit> seconds, and report how far they got.
+        If <time_limit> is None, they search until they are done.
+
+        If an <executor> is given, the searches of ':SOLVE' and ':HINT'
+        are submitted to it, e.g. to a process pool shared by many games,
+        instead of running in the caller's thread. The puzzle must then be
+        picklable. ':SOLVE-ALL' still runs in the caller's thread, since it
+        hands over each solution as soon as it is found; its time limit
+        bounds how long it keeps the caller busy.
+
+        If <workers> is given, ':SOLVE' and ':SOLVE-ALL' split the generic
+        search at the first move across that many processes (see
+        solver.parallel_solve), instead of using the puzzle's own
+        algorithm; the puzzle must be picklable, and <executor> is not
+        used for them. This suits puzzles whose own algorithm, if any, is
+        slower than searching every branch at once.
+
         @type puzzle: Puzzle
-        @type mode: str
+        @type mode: str | None
+        @type time_limit: float | None
+        @type executor: concurrent.futures.Executor | None
+        @type workers: int | None
         @rtype: None
         """
         self._puzzle = puzzle
+        self._start = puzzle
+        self._time_limit = time_limit
+        self._executor = executor
+        self._workers = workers
+        self._last_search = None
+        # hints can only share what they learn if states have keys
+        try:
+            puzzle.key()
+            self._hints = TranspositionTable(HINT_TABLE_SIZE)
+        except NotImplementedError:
+            self._hints = None
         if mode == 'text':
             self._view = TextView(self)
         elif mode == 'web':
             self._view = WebView(self)
+        elif mode is None:
+            self._view = None
         else:
             raise ValueError()
 
         # Create the tree data structure to record moves
         self._movetree = MoveTree(puzzle)
         # Start the game.
-        self._view.run()
+        if self._view is not None:
+            self._view.run()
+
+    def new_game(self, executor=None):
+        """Return a new controller, with no view, for a new game of the
+        puzzle this one started with.
+
+        The new game has the same time limit and workers, and runs
+        ':SOLVE' and ':HINT' on <executor> if it is given.
+
+        @type self: Controller
+        @type executor: concurrent.futures.Executor | None
+        @rtype: Controller
+        """
+        return Controller(self._start, None, self._time_limit, executor,
+                          self._workers)
 
     def state(self):
         """Return a string representation of the current puzzle state.
@@ -207,25 +310,36 @@ class Controller:
             return ('', True)
         # else if the action command is 'SOLVE'
         elif action == ':SOLVE':
-            # solve the puzzle
-            state = solve(self._puzzle)
+            # solve the puzzle on several processes if there are workers,
+            # otherwise with its own algorithm if it has one, on the
+            # executor if there is one
+            start = perf_counter()
+            if self._workers is not None:
+                state, stats = _parallel_solve(self._puzzle, self._workers,
+                                               self._time_limit)
+            elif self._executor is None:
+                state, stats = _solve(self._puzzle, self._time_limit)
+            else:
+                state, stats = self._executor.submit(
+                    _solve, self._puzzle, self._time_limit).result()
+            # if it took too long, say so, and the program should not end
+            if isinstance(state, SearchInterrupted):
+                self._record(':SOLVE gave up', stats, start)
+                return ('Gave up! ' + str(state), False)
             # if the state exists
             if state:
+                self._record(':SOLVE found a solution', stats, start)
                 # return the solution, and the program should end
                 return (str(state), True)
+            self._record(':SOLVE found no solution', stats, start)
             # otherwise return the error message, the program should end
             return ('Failed to solve from this point!', True)
         # else if the action command is 'SOLVE-ALL'
         elif action == ':SOLVE-ALL':
-            # get the all possible solution
-            states = solve_complete(self._puzzle)
-            # if the states exist
-            if states:
-                # return the all solutions in the correct format, and the
-                # program should end
-                return ('\n'.join(map(str, states)), True)
-            # otherwise return the error message, and program should end
-            return ('Failed to solve from this point!', True)
+            # join all the solutions found, and the program should end
+            chunks, should_quit = self.act_stream(action)
+            msg = '\n'.join(chunks)
+            return (msg, should_quit())
         # else if the action command let the program give hint
         elif action.startswith(':HINT'):
             # split the action command to the list of parts
@@ -250,8 +364,31 @@ class Controller:
                 # not end
                 return ('Incorrect action format for hints!', False)
             # otherwise get the hint by calling hint by depth function,
-            # the program should not end
-            return (hint_by_depth(self._puzzle, n), False)
+            # on the executor if there is one, the program should not end
+            start = perf_counter()
+            if self._executor is None:
+                hint, self._hints, stats = _hint(
+                    self._puzzle, n, self._hints, self._time_limit)
+            else:
+                # the table goes to the worker and comes back updated
+                hint, self._hints, stats = self._executor.submit(
+                    _hint, self._puzzle, n, self._hints,
+                    self._time_limit).result()
+            # if it took too long, give the best hint found so far
+            if isinstance(hint, SearchInterrupted):
+                self._record(action + ' gave up', stats, start)
+                msg = 'Gave up! ' + str(hint)
+                if hint.partial:
+                    msg += '\nBest hint so far: ' + hint.partial
+                return (msg, False)
+            self._record(action + ' found a hint', stats, start)
+            return (hint, False)
+        # else if the action command is 'STATS'
+        elif action == ':STATS':
+            # show how the last search went, and the program should not end
+            if self._last_search is None:
+                return ('No search has run yet!', False)
+            return (self._last_search, False)
         # if the action command is 'UNDO'
         elif action == ':UNDO':
             # return the string of the new current state and the current
@@ -288,6 +425,202 @@ class Controller:
             # and check whether it has been solved
             return (self.state(), state.is_solved())
 
+    def act_data(self, action):
+        """Run an action represented by string <action>, as 'act' does,
+        and return its result as data which can be written as JSON.
+
+        The result has the action, the message and whether the program
+        should end, as returned by 'act', and whether the current state
+        is solved and the current state itself (see Puzzle.to_data).
+
+        @type self: Controller
+        @type action: str
+        @rtype: dict
+        """
+        msg, should_quit = self.act(action)
+        return {'action': action, 'message': msg, 'should_quit': should_quit,
+                'solved': self._puzzle.is_solved(),
+                'state': self._puzzle.to_data()}
+
+    def act_stream(self, action):
+        """Run an action represented by string <action>, streaming its result.
+
+        Return an iterator over the pieces of the message, to be shown
+        one per line as they come, and a function which tells, once they
+        have all been shown, whether the program should end.
+        For ':SOLVE-ALL' each solution is produced as soon as it is found,
+        and the program ends only if the search ran to its end; every
+        other action produces its whole message from 'act'.
+
+        @type self: Controller
+        @type action: str
+        @rtype: (iterator[str], function)
+        """
+        # if the action command is 'SOLVE-ALL'
+        if action == ':SOLVE-ALL':
+            # stream the solutions; the program ends if they all were found
+            finished = []
+            return (self._stream_solutions(finished), lambda: bool(finished))
+        # otherwise run the action as usual
+        msg, should_quit = self.act(action)
+        return (iter([msg]), lambda: should_quit)
+
+    def start_job(self, action):
+        """Start solving the current state in the background.
+
+        <action> is ':SOLVE' or ':SOLVE-ALL'; the job looks for one or
+        all of the solutions within the same time limit as the action,
+        with the puzzle's own algorithm if it has one (see
+        Puzzle.direct_iter_solutions), as the action does. Unlike the
+        action, the job does not end the game.
+
+        Raise a ValueError for any other action.
+
+        @type self: Controller
+        @type action: str
+        @rtype: SolveJob
+        """
+        if action == ':SOLVE':
+            limit = 1
+        elif action == ':SOLVE-ALL':
+            limit = None
+        else:
+            raise ValueError('Only :SOLVE and :SOLVE-ALL can run as jobs!')
+        return SolveJob(self._puzzle, limit, direct=True,
+                        time_limit=self._time_limit).start()
+
+    def _record(self, outcome, stats, start):
+        """Record, for ':STATS', the <outcome> and <stats> of a search
+        which started at perf_counter time <start>.
+
+        @type self: Controller
+        @type outcome: str
+        @type stats: SearchStats | None
+        @type start: float
+        @rtype: None
+        """
+        self._last_search = '{} in {:.3f} s.'.format(
+            outcome, perf_counter() - start)
+        if stats is not None:
+            self._last_search += '\n' + str(stats)
+
+    def _stream_solutions(self, finished):
+        """Yield the string of each solution of the puzzle as it is found,
+        or an error message if there are none.
+
+        Append True to <finished> if the search runs to its end, rather
+        than giving up.
+
+        @type self: Controller
+        @type finished: list[bool]
+        @rtype: iterator[str]
+        """
+        # define that no solution is found yet
+        found = False
+        # loop the solutions, on several processes if there are workers,
+        # otherwise with the puzzle's own algorithm if it has one
+        if self._workers is not None:
+            solutions = _parallel_solutions(self._puzzle, self._workers,
+                                            self._time_limit)
+        else:
+            solutions = iter_solutions(self._puzzle, direct=True,
+                                       time_limit=self._time_limit)
+        try:
+            for state in solutions:
+                found = True
+                yield str(state)
+        # if it took too long, the solutions so far are all there is
+        except SearchInterrupted as e:
+            yield 'Gave up! ' + str(e)
+            return
+        finished.append(True)
+        # if no solutions exist, return the error message
+        if not found:
+            yield 'Failed to solve from this point!'
+
+
+def _solve(puzzle, time_limit):
+    """Solve <puzzle> as ':SOLVE' does, and return the solution (or None,
+    or the SearchInterrupted which stopped the search) and the statistics
+    of the search.
+
+    This is a function of its own so that it can run on a process pool,
+    and send its statistics back even if the search gives up.
+
+    @type puzzle: Puzzle
+    @type time_limit: float | None
+    @rtype: (Puzzle | SearchInterrupted | None, SearchStats)
+    """
+    stats = SearchStats()
+    try:
+        return solve(puzzle, direct=True, stats=stats,
+                     time_limit=time_limit), stats
+    except SearchInterrupted as e:
+        return e, stats
+
+
+def _hint(puzzle, n, hints, time_limit):
+    """Find a hint for <puzzle> as ':HINT <n>' does, with the table
+    <hints>, and return the hint (or the SearchInterrupted which stopped
+    the search), the table, and the statistics of the search.
+
+    On a process pool, the table returned is a copy, updated with what
+    this search learned, to replace the caller's.
+
+    @type puzzle: Puzzle
+    @type n: int
+    @type hints: TranspositionTable | None
+    @type time_limit: float | None
+    @rtype: (str | SearchInterrupted, TranspositionTable | None,
+             SearchStats)
+    """
+    stats = SearchStats()
+    try:
+        return (hint_by_depth(puzzle, n, hints, stats, time_limit=time_limit),
+                hints, stats)
+    except SearchInterrupted as e:
+        return e, hints, stats
+
+
+def _parallel_solve(puzzle, workers, time_limit):
+    """Solve <puzzle> on <workers> processes, and return the result as
+    _solve does.
+
+    Each process keeps its own statistics, so none are returned.
+
+    @type puzzle: Puzzle
+    @type workers: int
+    @type time_limit: float | None
+    @rtype: (Puzzle | SearchInterrupted | None, None)
+    """
+    try:
+        return parallel_solve(puzzle, workers, time_limit=time_limit), None
+    except SearchInterrupted as e:
+        return e, None
+
+
+def _parallel_solutions(puzzle, workers, time_limit):
+    """Yield the solutions of <puzzle> found on <workers> processes.
+
+    They are all found before the first is yielded. If the search runs
+    out of time, the solutions it found are yielded before the
+    SearchInterrupted is raised again.
+
+    @type puzzle: Puzzle
+    @type workers: int
+    @type time_limit: float | None
+    @rtype: iterator[Puzzle]
+    """
+    try:
+        solutions = parallel_solve_complete(puzzle, workers,
+                                            time_limit=time_limit)
+    except SearchInterrupted as e:
+        for state in e.partial:
+            yield state
+        raise
+    for state in solutions:
+        yield state
+
 
 if __name__ == '__main__':
     from sudoku_puzzle import SudokuPuzzle
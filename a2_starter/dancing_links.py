@@ -0,0 +1,263 @@
+# Assignment 2 - Puzzle Game
+#
+# CSC148 Summer 2017, University of Toronto
+# ---------------------------------------------
+"""Exact cover module.
+
+An exact cover problem gives a set of columns (the constraints) and a list
+of rows, each of which covers some of the columns. A solution is a choice
+of rows which covers every column exactly once.
+
+This module solves such problems with Knuth's Algorithm X, using the
+"dancing links" representation: the ones of the matrix form circular
+doubly linked lists along each row and each column, so that a column and
+the rows that clash with it can be removed and put back in constant time
+per link.
+
+Sudoku is an exact cover problem; see SudokuPuzzle.direct_solve.
+"""
+
+
+class ExactCover:
+    """An exact cover problem.
+
+    The links are stored in parallel lists indexed by node number, which
+    is much faster in Python than one object per node. Node 0 is the root,
+    nodes 1..n_columns are the column headers, and the remaining nodes are
+    the ones of the matrix.
+    """
+    # === Private attributes ===
+    # @type _left: list[int]
+    # @type _right: list[int]
+    # @type _up: list[int]
+    # @type _down: list[int]
+    #     The four neighbours of each node
+    # @type _column: list[int]
+    #     The column header of each node
+    # @type _row: list[int]
+    #     The row number of each node; -1 for the root and headers
+    # @type _size: list[int]
+    #     The number of nodes currently in each column, by header
+
+    def __init__(self, n_columns, rows):
+        """Create a new exact cover problem.
+
+        <rows> is a list of rows, each given as a list of the column
+        numbers (between 0 and n_columns - 1) that it covers.
+
+        @type self: ExactCover
+        @type n_columns: int
+        @type rows: list[list[int]]
+        @rtype: None
+        """
+        headers = range(n_columns + 1)
+        self._left = [i - 1 for i in headers]
+        self._left[0] = n_columns
+        self._right = [i + 1 for i in headers]
+        self._right[n_columns] = 0
+        self._up = list(headers)
+        self._down = list(headers)
+        self._column = list(headers)
+        self._row = [-1] * (n_columns + 1)
+        self._size = [0] * (n_columns + 1)
+
+        for row_number, columns in enumerate(rows):
+            first = None
+            for col in columns:
+                node = len(self._column)
+                header = col + 1
+                # Add the node at the bottom of its column
+                self._up.append(self._up[header])
+                self._down.append(header)
+                self._down[self._up[header]] = node
+                self._up[header] = node
+                self._column.append(header)
+                self._row.append(row_number)
+                self._size[header] += 1
+                # Add the node at the end of its row
+                if first is None:
+                    first = node
+                    self._left.append(node)
+                    self._right.append(node)
+                else:
+                    self._left.append(self._left[first])
+                    self._right.append(first)
+                    self._right[self._left[first]] = node
+                    self._left[first] = node
+
+    def solutions(self, limit=None, ordered=False, spend=None):
+        """Yield the solutions of this problem.
+
+        Each solution is a sorted list of row numbers. Stop after <limit>
+        solutions if <limit> is not None.
+
+        The search branches on the column with the fewest rows. If
+        <ordered> is True, it branches on the leftmost column instead,
+        unless some column has at most one row, so that the solutions
+        come in order of the rows covering the first column, then the
+        second, and so on; rows are in the order they were given.
+
+        If <spend> is given, it is called before each partial solution is
+        explored, and may raise an exception to stop the search.
+
+        The search uses an explicit stack instead of recursion, so its
+        depth is only bounded by memory.
+
+        @type self: ExactCover
+        @type limit: int | None
+        @type ordered: bool
+        @type spend: function | None
+        @rtype: iterator[list[int]]
+
+        >>> problem = ExactCover(3, [[0, 1], [2], [0], [1, 2]])
+        >>> list(problem.solutions())
+        [[0, 1], [2, 3]]
+        >>> list(problem.solutions(limit=1))
+        [[0, 1]]
+        >>> list(ExactCover(2, [[0], [0, 1]]).solutions(limit=0))
+        []
+        >>> problem = ExactCover(2, [[0], [0], [0, 1], [1]])
+        >>> list(problem.solutions())
+        [[2], [0, 3], [1, 3]]
+        >>> list(problem.solutions(ordered=True))
+        [[0, 3], [1, 3], [2]]
+        """
+        if limit is not None and limit <= 0:
+            return
+        right, down, column = self._right, self._down, self._column
+        found = 0
+        # The chosen node of each level of the search
+        stack = []
+        advance = True
+        try:
+            while True:
+                if advance:
+                    if spend is not None:
+                        spend()
+                    if right[0] == 0:
+                        # Every column is covered
+                        yield sorted(self._row[node] for node in stack)
+                        found += 1
+                        if limit is not None and found >= limit:
+                            break
+                        advance = False
+                    else:
+                        header = self._smallest_column()
+                        # A column with at most one row never reorders
+                        # the solutions
+                        if ordered and self._size[header] > 1:
+                            header = right[0]
+                        self._cover(header)
+                        node = down[header]
+                        if node == header:
+                            # No row covers this column
+                            self._uncover(header)
+                            advance = False
+                        else:
+                            stack.append(node)
+                            self._choose(node)
+                            continue
+                # Backtrack to the next row of the deepest level with one
+                if not stack:
+                    break
+                node = stack.pop()
+                self._unchoose(node)
+                header = column[node]
+                node = down[node]
+                if node == header:
+                    self._uncover(header)
+                else:
+                    stack.append(node)
+                    self._choose(node)
+                    advance = True
+        finally:
+            # Restore the links if the search stopped early
+            while stack:
+                node = stack.pop()
+                self._unchoose(node)
+                self._uncover(column[node])
+
+    def _smallest_column(self):
+        """Return the header of the column with the fewest nodes.
+
+        Ties go to the leftmost column.
+
+        @type self: ExactCover
+        @rtype: int
+        """
+        best = self._right[0]
+        header = self._right[best]
+        while header != 0:
+            if self._size[header] < self._size[best]:
+                best = header
+            header = self._right[header]
+        return best
+
+    def _choose(self, node):
+        """Cover the other columns of the row of <node>.
+
+        @type self: ExactCover
+        @type node: int
+        @rtype: None
+        """
+        other = self._right[node]
+        while other != node:
+            self._cover(self._column[other])
+            other = self._right[other]
+
+    def _unchoose(self, node):
+        """Undo _choose(node).
+
+        @type self: ExactCover
+        @type node: int
+        @rtype: None
+        """
+        other = self._left[node]
+        while other != node:
+            self._uncover(self._column[other])
+            other = self._left[other]
+
+    def _cover(self, header):
+        """Remove a column, and every row covering it from other columns.
+
+        @type self: ExactCover
+        @type header: int
+        @rtype: None
+        """
+        left, right, up, down = self._left, self._right, self._up, self._down
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                self._size[self._column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def _uncover(self, header):
+        """Undo _cover(header).
+
+        @type self: ExactCover
+        @type header: int
+        @rtype: None
+        """
+        left, right, up, down = self._left, self._right, self._up, self._down
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                self._size[self._column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[header]] = header
+        left[right[header]] = header
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,291 @@
+# Assignment 2 - Puzzle Game
+#
+# CSC148 Summer 2017, University of Toronto
+# ---------------------------------------------
+"""Word ladder index module.
+
+Precompute, once per word file, what every word ladder query on that file
+can share: for each word length, the graph of words one letter apart,
+split into its connected components, and optionally the distances from
+a few landmark words to every other word.
+
+With an index attached to its dictionary (see
+WordDictionary.set_ladder_index), a WordLadderPuzzle
+    - knows at once that there is no ladder between words in different
+      components, and
+    - has a tighter heuristic for solver.solve_best_first: the distance
+      between two words is at least the difference of their distances
+      to any landmark.
+
+The index is saved as JSON, so it is built offline and loaded by every
+process that answers queries.
+
+Usage:
+    python ladder_index.py wordsEn.json --landmarks 8
+    python batch.py ladders.txt --index wordsEn.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from word_ladder_puzzle import WordDictionary, WORDS_FILE
+
+
+class LadderIndex:
+    """The connected components and landmark distances of the word
+    graphs of a dictionary.
+
+    Two words are in the same component when there is a ladder between
+    them. Words not in the index, such as words which are not in the
+    dictionary or of a length which was not indexed, are never known to
+    have no ladder.
+    """
+    # === Private attributes ===
+    # @type _components: dict[str, int]
+    #     The number of the component of each indexed word
+    # @type _landmarks: dict[int, list[dict[str, int]]]
+    #     For each indexed length, the distances from each landmark to
+    #     the words of its component
+
+    def __init__(self, components, landmarks):
+        """Create a new index from its tables.
+
+        Use build or load rather than calling this directly.
+
+        @type self: LadderIndex
+        @type components: dict[str, int]
+        @type landmarks: dict[int, list[dict[str, int]]]
+        @rtype: None
+        """
+        self._components = components
+        self._landmarks = landmarks
+
+    @classmethod
+    def build(cls, dictionary, lengths=None, landmarks=0):
+        """Return the index of the words of <dictionary>.
+
+        Only words of the given <lengths> are indexed, or words of every
+        length if <lengths> is None. For each length, <landmarks> words
+        of its largest component are chosen, each as far as possible from
+        the ones before.
+
+        @type cls: type
+        @type dictionary: WordDictionary
+        @type lengths: list[int] | None
+        @type landmarks: int
+        @rtype: LadderIndex
+
+        >>> d = WordDictionary(words=['mare', 'care', 'cars', 'mist'])
+        >>> index = LadderIndex.build(d, landmarks=2)
+        >>> index.reachable('mare', 'cars'), index.reachable('mare', 'mist')
+        (True, False)
+        >>> index.lower_bound('mare', 'cars')
+        2
+        """
+        # group the words by length
+        by_length = {}
+        for word in dictionary:
+            if lengths is None or len(word) in lengths:
+                by_length.setdefault(len(word), []).append(word)
+        components = {}
+        tables = {}
+        for length, words in sorted(by_length.items()):
+            sizes = _label_components(dictionary, sorted(words), components)
+            tables[length] = _choose_landmarks(
+                dictionary, words, components, sizes, landmarks)
+        return cls(components, tables)
+
+    @classmethod
+    def load(cls, path):
+        """Return the index saved in the file <path>.
+
+        @type cls: type
+        @type path: str
+        @rtype: LadderIndex
+        """
+        with open(path) as f:
+            data = json.load(f)
+        components = {}
+        tables = {}
+        for length, table in data['lengths'].items():
+            words = table['words']
+            components.update(zip(words, table['components']))
+            tables[int(length)] = [
+                {word: d for word, d in zip(words, distances) if d >= 0}
+                for distances in table['landmarks']]
+        return cls(components, tables)
+
+    def save(self, path):
+        """Save this index to the file <path>.
+
+        @type self: LadderIndex
+        @type path: str
+        @rtype: None
+        """
+        lengths = {}
+        for word in sorted(self._components):
+            lengths.setdefault(len(word), []).append(word)
+        data = {'lengths': {}}
+        for length, words in lengths.items():
+            data['lengths'][str(length)] = {
+                'words': words,
+                'components': [self._components[word] for word in words],
+                'landmarks': [[table.get(word, -1) for word in words]
+                              for table in self._landmarks.get(length, [])]}
+        with open(path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    def reachable(self, word, other):
+        """Return whether there may be a ladder from <word> to <other>.
+
+        Return False only if it is certain that there is none.
+
+        @type self: LadderIndex
+        @type word: str
+        @type other: str
+        @rtype: bool
+
+        >>> index = LadderIndex.build(WordDictionary(words=['ab', 'ac']))
+        >>> index.reachable('ab', 'ac'), index.reachable('ab', 'abc')
+        (True, False)
+        >>> index.reachable('ab', 'xy')
+        True
+        """
+        if len(word) != len(other):
+            return False
+        a = self._components.get(word)
+        b = self._components.get(other)
+        return a is None or b is None or a == b
+
+    def lower_bound(self, word, other):
+        """Return a lower bound of the number of moves from <word> to
+        <other>, or float('inf') if there is no ladder between them.
+
+        The bound is the largest difference of the distances of the two
+        words to one landmark; it is 0 if no landmark reaches both.
+
+        @type self: LadderIndex
+        @type word: str
+        @type other: str
+        @rtype: float
+        """
+        if not self.reachable(word, other):
+            return float('inf')
+        bound = 0
+        for table in self._landmarks.get(len(word), []):
+            if word in table and other in table:
+                bound = max(bound, abs(table[word] - table[other]))
+        return bound
+
+
+def _label_components(dictionary, words, components):
+    """Record the component of each of <words> in <components>.
+
+    Components are numbered after those already in <components>.
+    Return the size of each new component, by number.
+
+    @type dictionary: WordDictionary
+    @type words: list[str]
+    @type components: dict[str, int]
+    @rtype: dict[int, int]
+    """
+    sizes = {}
+    number = len(set(components.values()))
+    for word in words:
+        if word in components:
+            continue
+        # label everything reachable from this word
+        distances = _distances(dictionary, word)
+        for other in distances:
+            components[other] = number
+        sizes[number] = len(distances)
+        number += 1
+    return sizes
+
+
+def _choose_landmarks(dictionary, words, components, sizes, count):
+    """Return the distance tables of <count> landmarks among <words>.
+
+    The first landmark is the first word of the largest component; each
+    next one is the word of that component farthest from the landmarks
+    already chosen.
+
+    @type dictionary: WordDictionary
+    @type words: list[str]
+    @type components: dict[str, int]
+    @type sizes: dict[int, int]
+    @type count: int
+    @rtype: list[dict[str, int]]
+    """
+    # a component of one word has nothing to bound
+    if count <= 0 or not sizes or max(sizes.values()) < 2:
+        return []
+    largest = max(sorted(sizes), key=lambda number: sizes[number])
+    landmark = min(word for word in words if components[word] == largest)
+    tables = []
+    # the distance of each word of the component to the nearest landmark
+    nearest = {}
+    while len(tables) < min(count, sizes[largest]):
+        table = _distances(dictionary, landmark)
+        tables.append(table)
+        for word, d in table.items():
+            nearest[word] = min(nearest.get(word, d), d)
+        landmark = max(sorted(nearest), key=lambda word: nearest[word])
+        # if every word is already a landmark
+        if nearest[landmark] == 0:
+            break
+    return tables
+
+
+def _distances(dictionary, source):
+    """Return the number of moves from <source> to every word it can
+    reach, by a breadth-first search.
+
+    @type dictionary: WordDictionary
+    @type source: str
+    @rtype: dict[str, int]
+
+    >>> d = WordDictionary(words=['mare', 'care', 'cars', 'mist'])
+    >>> sorted(_distances(d, 'mare').items())
+    [('care', 1), ('cars', 2), ('mare', 0)]
+    """
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        word = queue.popleft()
+        for other in dictionary.neighbours(word):
+            if other not in distances:
+                distances[other] = distances[word] + 1
+                queue.append(other)
+    return distances
+
+
+def main(argv=None):
+    """Build an index with the command line arguments <argv>.
+
+    @type argv: list[str] | None
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description='Precompute the word ladder index of a word list.')
+    parser.add_argument('output', help='file to save the index to')
+    parser.add_argument('--words', default=WORDS_FILE,
+                        help='word list to index (default: wordsEn.txt)')
+    parser.add_argument('--lengths', type=int, nargs='+', default=None,
+                        help='word lengths to index (default: all)')
+    parser.add_argument('--landmarks', type=int, default=0,
+                        help='landmarks per word length (default: 0)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = LadderIndex.build(WordDictionary(args.words), args.lengths,
+                              args.landmarks)
+    index.save(args.output)
+    print('{} words, {} components in {:.3f} s'.format(
+        len(index._components), len(set(index._components.values())),
+        time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
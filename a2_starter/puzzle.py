@@ -26,7 +26,51 @@ class Puzzle:
         - is_solved
         - extensions
         - move
+
+    Subclasses that implement 'key' also get __eq__ and __hash__, so that
+    states reached by different sequences of moves compare equal and
+    searches can recognise states they have already explored.
+
+    Subclasses may implement 'heuristic', and 'cost' if their moves do
+    not all cost the same, to guide solver.solve_best_first towards
+    a solution. Without them it is a uniform-cost search.
+
+    Subclasses may also implement direct_solve and direct_solve_complete
+    (and direct_iter_solutions, if their algorithm finds solutions one at
+    a time) to provide algorithms specific to their kind of puzzle, which
+    solver.solve, solver.solve_complete and solver.iter_solutions can use
+    instead of their generic search.
     """
+    # Puzzle has no attributes of its own, so that subclasses which
+    # declare __slots__ need no per-state __dict__.
+    __slots__ = ()
+
+    def __eq__(self, other):
+        """Return whether <self> and <other> are the same puzzle state.
+
+        States of a puzzle without 'key' are only equal to themselves.
+
+        @type self: Puzzle
+        @type other: Puzzle | object
+        @rtype: bool
+        """
+        if type(self) is not type(other):
+            return False
+        try:
+            return self.key() == other.key()
+        except NotImplementedError:
+            return self is other
+
+    def __hash__(self):
+        """Return a hash of this puzzle state, consistent with __eq__.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        try:
+            return hash(self.key())
+        except NotImplementedError:
+            return object.__hash__(self)
 
     def __str__(self):
         """Return a human-readable representation of this puzzle.
@@ -70,6 +114,19 @@ class Puzzle:
         """
         raise NotImplementedError()
 
+    def key(self):
+        """Return a hashable value identifying this puzzle state.
+
+        Two states must have equal keys exactly when the same moves can
+        be made from them, with the same results; e.g. a Sudoku grid
+        filled in the same way, in whatever order. Computing the key
+        should be cheap.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        raise NotImplementedError()
+
     def compare(self, state):
         """Return a move obtained by comparing with <state>
         or None if no differences found
@@ -80,3 +137,91 @@ class Puzzle:
         @rtype: str | None
         """
         raise NotImplementedError()
+
+    def to_data(self):
+        """Return this puzzle state as data which can be written as JSON,
+        for programs playing the game.
+
+        By default this is the string of the state.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return str(self)
+
+    def heuristic(self):
+        """Return an estimate of the cost of the cheapest way from <self>
+        to a solution.
+
+        The estimate should never be more than the actual cost, so that
+        solver.solve_best_first finds a cheapest solution. Return
+        float('inf') if <self> is known to lead to no solution.
+        By default there is no estimate, and 0 is returned.
+
+        @type self: Puzzle
+        @rtype: float
+        """
+        return 0
+
+    def cost(self, state):
+        """Return the cost of the move from <self> to <state>.
+
+        Precondition: <state> is one of the extensions of <self>.
+
+        By default every move costs 1, so the cost of a solution is its
+        number of moves.
+
+        @type self: Puzzle
+        @type state: Puzzle
+        @rtype: float
+        """
+        return 1
+
+    def direct_solve(self, spend=None):
+        """Return a solution found by an algorithm specific to this puzzle.
+
+        Return None if there are no possible solutions.
+        If <spend> is given, the algorithm calls it for each step of its
+        search, as for direct_iter_solutions.
+        Raise NotImplementedError if this kind of puzzle has no such
+        algorithm; solver.solve then falls back on its generic search.
+
+        @type self: Puzzle
+        @type spend: function | None
+        @rtype: Puzzle | None
+        """
+        raise NotImplementedError()
+
+    def direct_solve_complete(self):
+        """Return all solutions found by an algorithm specific to this puzzle.
+
+        Return an empty list if there are no possible solutions.
+        Raise NotImplementedError if this kind of puzzle has no such
+        algorithm; solver.solve_complete then falls back on its generic
+        search.
+
+        @type self: Puzzle
+        @rtype: list[Puzzle]
+        """
+        raise NotImplementedError()
+
+    def direct_iter_solutions(self, spend=None):
+        """Return an iterator over the solutions found by an algorithm
+        specific to this puzzle, in the order of direct_solve_complete.
+
+        If <spend> is given, the algorithm calls it for each step of its
+        search; it may raise an exception, such as
+        solver.SearchInterrupted, to stop the search.
+        Raise NotImplementedError if this kind of puzzle has no such
+        algorithm; solver.iter_solutions then falls back on its generic
+        search.
+
+        By default this is the list of direct_solve_complete, which does
+        not call <spend>. Puzzles whose algorithm finds its solutions one
+        at a time should yield each as soon as it is found instead.
+
+        @type self: Puzzle
+        @type spend: function | None
+        @rtype: iterator[Puzzle]
+        """
+        return iter(self.direct_solve_complete())
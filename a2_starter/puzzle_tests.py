@@ -2,10 +2,31 @@
 #
 # CSC148 Summer 2017, University of Toronto
 # ---------------------------------------------
+import gzip
+import http.client
+import http.server
+import json
+import os
+import socket
+import tempfile
+import threading
 import unittest
 from sudoku_puzzle import SudokuPuzzle
-from word_ladder_puzzle import WordLadderPuzzle
-from solver import solve, solve_complete, hint_by_depth
+from word_ladder_puzzle import WordLadderPuzzle, WordDictionary
+from solver import solve, solve_complete, hint_by_depth, iter_solutions
+from solver import TranspositionTable, SearchStats, SearchInterrupted
+from solver import parallel_solve, parallel_solve_complete, solve_best_first
+from solver import SolveJob
+from puzzle import Puzzle
+from ladder_index import LadderIndex
+from controller import Controller
+from view import WebView, MAX_BODY, GZIP_MIN_SIZE
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+import controller
+
+# The much smaller word list used by the word ladder tests.
+TEST_WORDS = WordDictionary('wordsEnTest.txt')
 
 
 class SudokuPossibleLettersTest(unittest.TestCase):
@@ -66,6 +87,26 @@ class SudokuMoveTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             s.move('2 2 C')
 
+    def test_letter_out_of_range(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', '', ''],
+                          ['D', 'C', '', '']])
+        with self.assertRaises(ValueError):
+            s.move('(2, 2) -> E')
+
+    def test_sixteen_move(self):
+        grid = [[''] * 16 for _ in range(16)]
+        grid[0][15] = 'P'
+        grid[15][0] = 'O'
+        grid[1][1] = 'N'
+        s = SudokuPuzzle(grid)
+        self.assertEqual(s._possible_letters(0, 0), list('ABCDEFGHIJKLM'))
+        with self.assertRaises(ValueError):
+            s.move('(0, 0) -> N')
+        new_s = s.move('(0, 0) -> M')
+        self.assertEqual(new_s._possible_letters(0, 1), list('ABCDEFGHIJKLO'))
+
     def test_nine_extensions(self):
         big = SudokuPuzzle([
             ['E', 'C', '', '', 'G', '', '', '', ''],
@@ -84,9 +125,153 @@ class SudokuMoveTest(unittest.TestCase):
                          ['E', 'G', 'I'])
 
 
+class SudokuIsSolvedTest(unittest.TestCase):
+    def test_invalid_full_grid(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', 'D', 'C'],
+                          ['D', 'C', 'A', 'B']])
+        self.assertFalse(s.is_solved())
+
+    def test_letter_out_of_range(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'E'],
+                          ['C', 'E', 'A', 'B'],
+                          ['B', 'A', 'E', 'C'],
+                          ['E', 'C', 'B', 'A']])
+        self.assertFalse(s.is_solved())
+
+    def test_clash_stays_unsolved(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', 'D', 'C'],
+                          ['D', 'C', 'B', '']])
+        self.assertFalse(s._extend('B', 3, 3).is_solved())
+        self.assertTrue(s._extend('A', 3, 3).is_solved())
+
+    def test_solved_after_propagation(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', '', ''],
+                          ['D', 'C', '', '']], propagate=True)
+        # The one move fills in the other three cells
+        self.assertEqual([x.is_solved() for x in s.extensions()], [True])
+
+
+class SudokuBranchingTest(unittest.TestCase):
+    def test_mrv_picks_forced_cell(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', 'C']], 'mrv')
+        exts = s.extensions()
+        self.assertEqual(len(exts), 1)
+        self.assertEqual(s.compare(exts[0]), '(0, 3) -> D')
+
+    def test_mrv_solves_nine(self):
+        big = SudokuPuzzle([
+            ['E', 'C', '', '', 'G', '', '', '', ''],
+            ['F', '', '', 'A', 'I', 'E', '', '', ''],
+            ['', 'I', 'H', '', '', '', '', 'F', ''],
+            ['H', '', '', '', 'F', '', '', '', 'C'],
+            ['D', '', '', 'H', '', 'C', '', '', 'A'],
+            ['G', '', '', '', 'B', '', '', '', 'F'],
+            ['', 'F', '', '', '', '', 'B', 'H', ''],
+            ['', '', '', 'D', 'A', 'I', '', '', 'E'],
+            ['', '', '', '', 'H', '', '', 'G', 'I']], 'mrv')
+        self.assertTrue(solve(big).is_solved())
+
+    def test_propagate_solves_nine(self):
+        big = SudokuPuzzle([
+            ['E', 'C', '', '', 'G', '', '', '', ''],
+            ['F', '', '', 'A', 'I', 'E', '', '', ''],
+            ['', 'I', 'H', '', '', '', '', 'F', ''],
+            ['H', '', '', '', 'F', '', '', '', 'C'],
+            ['D', '', '', 'H', '', 'C', '', '', 'A'],
+            ['G', '', '', '', 'B', '', '', '', 'F'],
+            ['', 'F', '', '', '', '', 'B', 'H', ''],
+            ['', '', '', 'D', 'A', 'I', '', '', 'E'],
+            ['', '', '', '', 'H', '', '', 'G', 'I']])
+        self.assertTrue(big.propagate().is_solved())
+
+    def test_propagate_contradiction(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', 'C', ''],
+                          ['', '', '', 'C'],
+                          ['', '', '', '']])
+        self.assertIsNone(s.propagate())
+
+    def test_propagating_extensions(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['B', '', '', ''],
+                          ['D', '', 'A', '']], 'mrv', True)
+        solutions = solve_complete(s)
+        self.assertEqual(len(solutions), 2)
+        for solution in solutions:
+            self.assertTrue(solution.is_solved())
+
+    def test_unknown_branching(self):
+        with self.assertRaises(ValueError):
+            SudokuPuzzle([['']], 'last')
+
+
+class SudokuExactCoverTest(unittest.TestCase):
+    def test_same_as_generic(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['B', '', '', ''],
+                          ['D', '', 'A', '']])
+        self.assertEqual(list(map(str, solve_complete(s, direct=True))),
+                         list(map(str, solve_complete(s))))
+
+    def test_invalid_grid(self):
+        s = SudokuPuzzle([['A', 'A', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        self.assertIsNone(s.direct_solve())
+        self.assertEqual(s.count_solutions(), 0)
+
+    def test_iter_same_order(self):
+        s = SudokuPuzzle([[''] * 4 for _ in range(4)])
+        self.assertEqual(list(map(str, s.direct_iter_solutions())),
+                         list(map(str, s.direct_solve_complete())))
+
+    def test_iter_keeps_to_budget(self):
+        s = SudokuPuzzle([[''] * 9 for _ in range(9)])
+        solutions = iter_solutions(s, direct=True, node_limit=200)
+        self.assertTrue(next(solutions).is_solved())
+        with self.assertRaises(SearchInterrupted):
+            list(solutions)
+        with self.assertRaises(SearchInterrupted):
+            solve_complete(s, direct=True, time_limit=0.1)
+
+    def test_direct_solve_keeps_to_budget(self):
+        s = SudokuPuzzle([[''] * 9 for _ in range(9)])
+        with self.assertRaises(SearchInterrupted):
+            solve(s, direct=True, node_limit=10)
+        self.assertTrue(solve(s, direct=True, node_limit=1000).is_solved())
+        with self.assertRaises(SearchInterrupted):
+            solve(WordLadderPuzzle('cold', 'warm'), direct=True, node_limit=1)
+
+    def test_unique_nine(self):
+        big = SudokuPuzzle([
+            ['E', 'C', '', '', 'G', '', '', '', ''],
+            ['F', '', '', 'A', 'I', 'E', '', '', ''],
+            ['', 'I', 'H', '', '', '', '', 'F', ''],
+            ['H', '', '', '', 'F', '', '', '', 'C'],
+            ['D', '', '', 'H', '', 'C', '', '', 'A'],
+            ['G', '', '', '', 'B', '', '', '', 'F'],
+            ['', 'F', '', '', '', '', 'B', 'H', ''],
+            ['', '', '', 'D', 'A', 'I', '', '', 'E'],
+            ['', '', '', '', 'H', '', '', 'G', 'I']])
+        self.assertEqual(big.count_solutions(2), 1)
+        self.assertTrue(big.direct_solve().is_solved())
+
+
 class WordLadderPart1Test(unittest.TestCase):
-    # Note: replace the given wordsEn.txt with
-    # the much smaller provided file wordsEnTest.txt.
+    # Note: these tests use the much smaller provided
+    # file wordsEnTest.txt instead of wordsEn.txt.
     #
     # Keep in mind that we aren't specifying an output
     # format, so we arn't testing the internal state
@@ -94,28 +279,28 @@ class WordLadderPart1Test(unittest.TestCase):
     # Instead, we'll be running some implicit tests based
     # on the structure required by the 'extensions' method.
     def test_is_not_solved_start(self):
-        word_ladder = WordLadderPuzzle('mist', 'mare')
+        word_ladder = WordLadderPuzzle('mist', 'mare', dictionary=TEST_WORDS)
         self.assertFalse(word_ladder.is_solved())
 
     def test_is_solved_start(self):
-        word_ladder = WordLadderPuzzle('mist', 'mist')
+        word_ladder = WordLadderPuzzle('mist', 'mist', dictionary=TEST_WORDS)
         self.assertTrue(word_ladder.is_solved())
 
     def test_no_extensions(self):
-        word_ladder = WordLadderPuzzle('mist', 'mare')
+        word_ladder = WordLadderPuzzle('mist', 'mare', dictionary=TEST_WORDS)
         self.assertEqual(word_ladder.extensions(), [])
 
     def test_one_extensions(self):
-        word_ladder = WordLadderPuzzle('mire', 'mare')
+        word_ladder = WordLadderPuzzle('mire', 'mare', dictionary=TEST_WORDS)
         self.assertEqual(len(word_ladder.extensions()), 1)
 
     # Also checking is_solved here.
     def test_solved_extension(self):
-        word_ladder = WordLadderPuzzle('mire', 'mare')
+        word_ladder = WordLadderPuzzle('mire', 'mare', dictionary=TEST_WORDS)
         self.assertTrue(word_ladder.extensions()[0].is_solved())
 
     def test_alphabetical(self):
-        word_ladder = WordLadderPuzzle('mare', 'mire')
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
         # Should have 4 extensions: 'care', 'male', 'mars', 'mire',
         # in that order.
         exts = word_ladder.extensions()
@@ -123,7 +308,7 @@ class WordLadderPart1Test(unittest.TestCase):
         self.assertTrue(exts[-1].is_solved())
 
     def test_no_duplicates(self):
-        word_ladder = WordLadderPuzzle('mare', 'mire')
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
         exts = word_ladder.extensions()
         should_be_care = exts[0]
         # Only one extension: 'cars'. 'mare' should not be revisited.
@@ -138,23 +323,797 @@ class WordLadderPart1Test(unittest.TestCase):
 
 class WordLadderPart2Test(unittest.TestCase):
     def test_move_simple(self):
-        word_ladder = WordLadderPuzzle('mare', 'mire')
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
         new_ladder = word_ladder.move('mire')
         self.assertTrue(new_ladder.is_solved())
 
     def test_invalid_word1(self):
-        word_ladder = WordLadderPuzzle('mare', 'mire')
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
         with self.assertRaises(ValueError):
             # Not in dictionary
             word_ladder.move('maze')
 
     def test_invalid_word2(self):
-        word_ladder = WordLadderPuzzle('mare', 'mire')
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
         with self.assertRaises(ValueError):
             # In dictionary, but not one letter away.
             word_ladder.move('cars')
 
 
+class WordLadderShortestTest(unittest.TestCase):
+    def test_shortest(self):
+        word_ladder = WordLadderPuzzle('cars', 'male', dictionary=TEST_WORDS)
+        solved = word_ladder.shortest_ladder()
+        self.assertTrue(solved.is_solved())
+        self.assertEqual(str(solved), 'cars care mare male')
+
+    def test_keeps_history(self):
+        word_ladder = WordLadderPuzzle('care', 'mire', dictionary=TEST_WORDS)
+        solved = word_ladder.move('cars').shortest_ladder()
+        self.assertEqual(str(solved), 'care cars mars mare mire')
+
+    def test_no_ladder(self):
+        word_ladder = WordLadderPuzzle('mist', 'mare', dictionary=TEST_WORDS)
+        self.assertIsNone(word_ladder.shortest_ladder())
+        self.assertEqual(word_ladder.all_shortest_ladders(), [])
+
+    def test_all_shortest(self):
+        word_ladder = WordLadderPuzzle('care', 'mars', dictionary=TEST_WORDS)
+        self.assertEqual(list(map(str, word_ladder.all_shortest_ladders())),
+                         ['care cars mars', 'care mare mars'])
+
+    def test_solve_direct(self):
+        word_ladder = WordLadderPuzzle('cars', 'male', dictionary=TEST_WORDS)
+        self.assertEqual(str(solve(word_ladder, direct=True)),
+                         'cars care mare male')
+
+
+class WordDictionaryTest(unittest.TestCase):
+    def test_shared_by_path(self):
+        self.assertIs(WordDictionary.shared('wordsEnTest.txt'),
+                      WordDictionary.shared('./wordsEnTest.txt'))
+
+    def test_loaded_lazily(self):
+        words = WordDictionary('no_such_file.txt')
+        WordLadderPuzzle('mare', 'mire', dictionary=words)
+        with self.assertRaises(IOError):
+            'mare' in words
+
+    def test_neighbours(self):
+        self.assertEqual(sorted(TEST_WORDS.neighbours('mare')),
+                         ['care', 'male', 'mars', 'mire'])
+        self.assertEqual(TEST_WORDS.neighbours('mist'), [])
+
+    def test_shared_by_extensions(self):
+        word_ladder = WordLadderPuzzle('mare', 'mire', dictionary=TEST_WORDS)
+        for ext in word_ladder.extensions():
+            self.assertIs(ext._dictionary, TEST_WORDS)
+
+
+class LadderIndexTest(unittest.TestCase):
+    def setUp(self):
+        # A dictionary of its own, so that the index is not set on
+        # the one shared by the other tests
+        self.words = WordDictionary('wordsEnTest.txt')
+        self.index = LadderIndex.build(self.words, landmarks=2)
+
+    def test_components(self):
+        self.assertTrue(self.index.reachable('cars', 'mire'))
+        self.assertFalse(self.index.reachable('cars', 'mist'))
+        self.assertEqual(self.index.lower_bound('cars', 'mist'),
+                         float('inf'))
+
+    def test_save_and_load(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.index.save(path)
+            loaded = LadderIndex.load(path)
+        finally:
+            os.remove(path)
+        for word in self.words:
+            for other in self.words:
+                self.assertEqual(loaded.lower_bound(word, other),
+                                 self.index.lower_bound(word, other))
+
+    def test_lower_bound_admissible(self):
+        for word in self.words:
+            for other in self.words:
+                ladder = WordLadderPuzzle(word, other,
+                                          dictionary=self.words)
+                shortest = ladder.shortest_ladder()
+                if shortest is not None:
+                    self.assertLessEqual(
+                        self.index.lower_bound(word, other),
+                        len(str(shortest).split()) - 1)
+
+    def test_puzzle_uses_index(self):
+        self.words.set_ladder_index(self.index)
+        word_ladder = WordLadderPuzzle('care', 'mist', dictionary=self.words)
+        self.assertEqual(word_ladder.heuristic(), float('inf'))
+        self.assertIsNone(word_ladder.shortest_ladder())
+        word_ladder = WordLadderPuzzle('cars', 'male', dictionary=self.words)
+        self.assertEqual(str(solve_best_first(word_ladder)),
+                         'cars care mare male')
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_sudoku_states_equal(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', '', ''],
+                          ['D', 'C', '', '']])
+        first = s.move('(2, 2) -> D').move('(3, 3) -> A')
+        second = s.move('(3, 3) -> A').move('(2, 2) -> D')
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second, s}), 2)
+
+    def test_states_without_key(self):
+        first, second = ChainPuzzle(1), ChainPuzzle(1)
+        self.assertEqual(first, first)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len({first, second, first}), 2)
+
+    def test_ladder_dead_states_pruned(self):
+        word_ladder = WordLadderPuzzle('care', 'mist', dictionary=TEST_WORDS)
+        table = TranspositionTable()
+        self.assertIsNone(solve(word_ladder, table=table))
+        self.assertEqual(table.hits, 0)
+        # The second search skips every state the first one explored
+        self.assertEqual(solve_complete(word_ladder, table=table), [])
+        self.assertEqual(table.hits, len(word_ladder.extensions()))
+
+    def test_hint_same_with_table(self):
+        s = SudokuPuzzle([['', 'B', 'C', 'D'],
+                          ['C', 'D', '', 'B'],
+                          ['B', '', 'D', 'C'],
+                          ['D', 'C', 'B', '']])
+        table = TranspositionTable(10)
+        for n in range(1, 5):
+            self.assertEqual(hint_by_depth(s, n, table), hint_by_depth(s, n))
+        self.assertLessEqual(len(table), 10)
+
+
+class HintTest(unittest.TestCase):
+    def test_hint_leads_to_solution(self):
+        word_ladder = WordLadderPuzzle('care', 'mire', dictionary=TEST_WORDS)
+        # 'cars' comes first, but only 'mare' leads to 'mire'
+        self.assertEqual(hint_by_depth(word_ladder, 2), 'mare')
+
+    def test_solution_within_first_bound(self):
+        word_ladder = WordLadderPuzzle('ye', 'ac')
+        # No solution is within 2 moves; within 4, 'be' comes first,
+        # although 'de' leads to a solution in 3
+        self.assertEqual(hint_by_depth(word_ladder, 100), 'be')
+        self.assertEqual(hint_by_depth(word_ladder, 3), 'de')
+
+    def test_table_kept_between_hints(self):
+        word_ladder = WordLadderPuzzle('cold', 'warm')
+        table = TranspositionTable()
+        self.assertEqual(hint_by_depth(word_ladder, 4, table), 'cord')
+        stats = SearchStats()
+        self.assertEqual(hint_by_depth(word_ladder, 4, table, stats), 'cord')
+        # Only the moves from the puzzle itself are generated again
+        self.assertEqual(stats.nodes, 1)
+        next_hint = hint_by_depth(word_ladder.move('cord'), 3, table)
+        self.assertEqual(next_hint, hint_by_depth(word_ladder.move('cord'), 3))
+
+
+class SearchStatsTest(unittest.TestCase):
+    def test_dead_end_counted(self):
+        s = SudokuPuzzle([['A', 'B', 'C', 'D'],
+                          ['C', 'D', 'A', 'B'],
+                          ['B', 'A', '', ''],
+                          ['D', 'C', '', 'D']])
+        stats = SearchStats()
+        self.assertIsNone(solve(s, stats=stats))
+        # No letter fits the first empty cell
+        self.assertEqual(stats.nodes, 1)
+        self.assertEqual(stats.dead_ends, 1)
+        self.assertEqual(stats.max_depth, 0)
+        self.assertEqual(stats.branching_factor(), 0.0)
+
+    def test_stats_add_up(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        stats = SearchStats()
+        solutions = solve_complete(s, stats=stats)
+        nodes = stats.nodes
+        # Every empty cell is filled on the way to a solution
+        self.assertEqual(stats.max_depth, 13)
+        self.assertGreaterEqual(stats.checks, stats.children)
+        self.assertEqual(solve_complete(s), solutions)
+        hint_by_depth(s, 2, stats=stats)
+        self.assertGreater(stats.nodes, nodes)
+
+    def test_direct_records_steps(self):
+        stats = SearchStats()
+        solve(WordLadderPuzzle('ye', 'ac'), direct=True, stats=stats)
+        self.assertEqual(stats.nodes, 0)
+        self.assertGreater(stats.steps, 0)
+
+
+class SearchBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.empty = SudokuPuzzle([[''] * 9 for _ in range(9)])
+
+    def test_node_limit(self):
+        with self.assertRaises(SearchInterrupted) as cm:
+            solve(self.empty, node_limit=10)
+        self.assertEqual(cm.exception.reason, 'nodes')
+        self.assertEqual(cm.exception.nodes, 10)
+        self.assertFalse(cm.exception.partial.is_solved())
+
+    def test_time_limit(self):
+        with self.assertRaises(SearchInterrupted) as cm:
+            solve_complete(self.empty, time_limit=0)
+        self.assertEqual(cm.exception.reason, 'time')
+        self.assertEqual(cm.exception.partial, [])
+
+    def test_cancelled(self):
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(SearchInterrupted) as cm:
+            hint_by_depth(self.empty, 3, cancel=cancel)
+        self.assertEqual(cm.exception.reason, 'cancelled')
+        self.assertEqual(cm.exception.partial, '(0, 0) -> A')
+
+    def test_enough_budget(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        self.assertEqual(solve_complete(s, time_limit=60, node_limit=10000),
+                         solve_complete(s))
+
+
+class SolveJobTest(unittest.TestCase):
+    def test_finds_all(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['B', '', '', ''],
+                          ['D', '', 'A', '']])
+        job = SolveJob(s).start()
+        while not job.finished():
+            job.wait_for_change(len(job.solutions), 10)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.solutions, solve_complete(s))
+        self.assertGreater(job.stats.nodes, 0)
+
+    def test_cancel(self):
+        job = SolveJob(SudokuPuzzle([[''] * 9 for _ in range(9)])).start()
+        self.assertTrue(job.wait_for_change(0, 10))
+        job.cancel()
+        while not job.finished():
+            job.wait_for_change(len(job.solutions), 10)
+        self.assertEqual(job.status, 'cancelled')
+        self.assertGreater(len(job.solutions), 0)
+
+    def test_out_of_budget(self):
+        job = SolveJob(SudokuPuzzle([[''] * 9 for _ in range(9)]),
+                       node_limit=10).start()
+        self.assertTrue(job.wait_for_change(0, 10))
+        self.assertEqual(job.status, 'stopped')
+        self.assertEqual(job.solutions, [])
+
+    def test_controller_job_direct(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        job = Controller(s, None).start_job(':SOLVE-ALL')
+        while not job.finished():
+            job.wait_for_change(len(job.solutions), 10)
+        self.assertEqual(job.solutions, solve_complete(s, direct=True))
+        self.assertGreater(job.stats.steps, 0)
+        self.assertEqual(job.stats.nodes, 0)
+
+
+class ActDataTest(unittest.TestCase):
+    def test_sudoku_move(self):
+        c = Controller(SudokuPuzzle([['A', ''], ['', '']]), None)
+        result = c.act_data('(0, 1) -> B')
+        self.assertEqual(result['state'], {'grid': [['A', 'B'], ['', '']]})
+        self.assertFalse(result['solved'])
+        self.assertFalse(result['should_quit'])
+
+    def test_ladder_solved(self):
+        c = Controller(WordLadderPuzzle('mare', 'care', dictionary=TEST_WORDS),
+                       None)
+        result = c.act_data('care')
+        self.assertEqual(result['state'],
+                         {'words': ['mare', 'care'], 'target': 'care'})
+        self.assertTrue(result['solved'])
+        self.assertTrue(result['should_quit'])
+
+    def test_solve_all_gave_up_goes_on(self):
+        c = Controller(SudokuPuzzle([[''] * 9 for _ in range(9)]), None,
+                       time_limit=0.2)
+        msg, should_quit = c.act(':SOLVE-ALL')
+        self.assertIn('Gave up!', msg)
+        self.assertFalse(should_quit)
+
+
+class StatsCommandTest(unittest.TestCase):
+    def test_no_search_yet(self):
+        c = Controller(WordLadderPuzzle('ye', 'ac'), None)
+        self.assertEqual(c.act(':STATS'), ('No search has run yet!', False))
+
+    def test_last_hint(self):
+        c = Controller(WordLadderPuzzle('ye', 'ac'), None)
+        c.act(':HINT 2')
+        msg, should_quit = c.act(':STATS')
+        self.assertTrue(msg.startswith(':HINT 2 found a hint in '))
+        self.assertIn('states expanded: ', msg)
+        self.assertFalse(should_quit)
+
+    def test_last_solve(self):
+        c = Controller(SudokuPuzzle([[''] * 9 for _ in range(9)]), None)
+        c.act(':SOLVE')
+        msg = c.act(':STATS')[0]
+        self.assertTrue(msg.startswith(':SOLVE found a solution in '))
+        self.assertNotIn("algorithm: 0", msg)
+
+
+class HintTableTest(unittest.TestCase):
+    def test_small_cap(self):
+        c = Controller(SudokuPuzzle([[''] * 9 for _ in range(9)]), None)
+        self.assertLessEqual(c._hints._maxsize, 10000)
+
+    def test_evicts(self):
+        with mock.patch.object(controller, 'HINT_TABLE_SIZE', 20):
+            c = Controller(SudokuPuzzle([[''] * 4 for _ in range(4)]), None)
+        for n in range(1, 5):
+            c.act(':HINT {}'.format(n))
+        self.assertEqual(len(c._hints), 20)
+
+
+class WebSessionTest(unittest.TestCase):
+    def setUp(self):
+        s = SudokuPuzzle([['A', ''], ['', '']])
+        self.view = WebView(Controller(s, None))
+
+    def test_cookie_finds_session(self):
+        first, new = self.view.session(None)
+        self.assertTrue(new)
+        again, new = self.view.session('session=' + first.id)
+        self.assertIs(again, first)
+        self.assertFalse(new)
+        self.assertIsNot(self.view.session('session=unknown')[0], first)
+
+    def test_lookup_creates_nothing(self):
+        self.assertEqual(self.view.session(None, False), (None, False))
+        self.assertEqual(self.view.session('session=unknown', False),
+                         (None, False))
+        first = self.view.session(None)[0]
+        self.assertEqual(self.view.session('session=' + first.id, False),
+                         (first, False))
+
+    def test_sessions_isolated(self):
+        first = self.view.session(None)[0]
+        second = self.view.session(None)[0]
+        first.act_batch(['(0, 1) -> B'])
+        self.assertEqual(first.act_batch([':'])['results'][0]['state'],
+                         {'grid': [['A', 'B'], ['', '']]})
+        self.assertEqual(second.act_batch([':'])['results'][0]['state'],
+                         {'grid': [['A', ''], ['', '']]})
+
+    def test_ending_one_game(self):
+        first = self.view.session(None)[0]
+        second = self.view.session(None)[0]
+        self.assertTrue(first.act_batch([':EXIT'])['done'])
+        self.assertEqual(first.act_batch([':']), {'results': [], 'done': True})
+        self.assertEqual(''.join(first.act_stream(':')), '')
+        result = second.act_batch([':'])
+        self.assertFalse(result['done'])
+        self.assertEqual(len(result['results']), 1)
+
+    def test_hint_on_executor(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        with ProcessPoolExecutor(1) as executor:
+            c = Controller(s, None).new_game(executor)
+            self.assertEqual(c.act(':HINT 3'), (hint_by_depth(s, 3), False))
+        # the table learned in the worker came back
+        self.assertGreater(len(c._hints), 0)
+        self.assertTrue(c.act(':STATS')[0].startswith(':HINT 3 found'))
+
+    def test_solve_on_executor(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        with ProcessPoolExecutor(1) as executor:
+            c = Controller(s, None).new_game(executor)
+            msg, should_quit = c.act(':SOLVE')
+        self.assertTrue(should_quit)
+        self.assertEqual(msg, str(solve(s, direct=True)))
+
+
+class AttemptsTest(unittest.TestCase):
+    def test_order_and_same_move(self):
+        c = Controller(SudokuPuzzle([['', ''], ['', '']]), None)
+        for action in ['(0, 1) -> B', ':UNDO', '(0, 0) -> A', ':UNDO',
+                       '(0,1)->B', ':UNDO']:
+            c.act(action)
+        attempts, _ = c.act(':ATTEMPTS')
+        self.assertEqual([line for line in attempts.split('\n')
+                          if '->' in line], ['(0, 1) -> B', '(0, 0) -> A'])
+
+
+class WebServerTestCase(unittest.TestCase):
+    # Serves a WebView on a free port for the tests of its subclasses,
+    # and talks to it over one kept-alive connection with the session
+    # cookie it was given.
+    def make_puzzle(self):
+        return SudokuPuzzle([['A', 'B', '', ''],
+                             ['C', 'D', '', ''],
+                             ['', '', '', ''],
+                             ['', '', '', '']])
+
+    def setUp(self):
+        # keep the request log out of the test output
+        quiet = mock.patch.object(http.server.BaseHTTPRequestHandler,
+                                  'log_message')
+        quiet.start()
+        self.addCleanup(quiet.stop)
+        self.httpd = WebView(Controller(self.make_puzzle(), None),
+                             port=0).server()
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        self.conn = http.client.HTTPConnection('localhost', self.port,
+                                               timeout=10)
+        self.cookie = None
+
+    def tearDown(self):
+        self.conn.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie is not None:
+            headers['Cookie'] = self.cookie
+        self.conn.request(method, path, body, headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        cookie = response.getheader('Set-Cookie')
+        if cookie is not None:
+            self.cookie = cookie.split(';')[0]
+        return response, data
+
+    def request_json(self, method, path, body=None, headers=None):
+        response, data = self.request(method, path, body, headers)
+        return response.status, json.loads(str(data, 'UTF-8'))
+
+
+class ActionApiHttpTest(WebServerTestCase):
+    def test_get_one_action(self):
+        status, data = self.request_json(
+            'GET', '/api/actions?action=(0,%202)%20->%20C')
+        self.assertEqual(status, 200)
+        self.assertFalse(data['done'])
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['state']['grid'][0],
+                         ['A', 'B', 'C', ''])
+
+    def test_post_batch(self):
+        body = json.dumps({'actions': ['(0, 2) -> C', ':UNDO',
+                                       '(0, 2) -> D', ':SOLVE', ':']})
+        status, data = self.request_json(
+            'POST', '/api/actions', body,
+            {'Content-Type': 'application/json'})
+        self.assertEqual(status, 200)
+        self.assertTrue(data['done'])
+        # the action after the solve which ended the game is not run
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual(data['results'][2]['state']['grid'][0],
+                         ['A', 'B', 'D', ''])
+        self.assertTrue(data['results'][3]['should_quit'])
+
+    def test_same_session_across_requests(self):
+        self.request_json('GET', '/api/actions?action=(0,%202)%20->%20C')
+        status, data = self.request_json('POST', '/api/actions',
+                                         json.dumps({'actions': [':']}))
+        self.assertEqual(data['results'][0]['state']['grid'][0],
+                         ['A', 'B', 'C', ''])
+
+    def test_body_too_large(self):
+        self.conn.putrequest('POST', '/api/actions')
+        self.conn.putheader('Content-Length', str(MAX_BODY + 1))
+        self.conn.endheaders()
+        response = self.conn.getresponse()
+        self.assertEqual(response.status, 413)
+        self.assertIn('too large', json.loads(str(response.read(),
+                                                  'UTF-8'))['error'])
+
+    def test_negative_length(self):
+        self.conn.putrequest('POST', '/api/actions')
+        self.conn.putheader('Content-Length', '-1')
+        self.conn.endheaders()
+        response = self.conn.getresponse()
+        self.assertEqual(response.status, 400)
+        self.assertIn('Content-Length', json.loads(str(response.read(),
+                                                       'UTF-8'))['error'])
+
+    def test_bad_bodies(self):
+        for body in [b'not json', b'[]', b'{"actions": [1]}',
+                     b'{"actions": "(0, 2) -> C"}', b'\xff']:
+            status, data = self.request_json('POST', '/api/actions', body)
+            self.assertEqual(status, 400)
+            self.assertIn('error', data)
+
+    def test_not_found(self):
+        status, data = self.request_json('POST', '/actions', b'{}')
+        self.assertEqual((status, data), (404, {'error': 'Not found!'}))
+        self.conn.close()
+        status, data = self.request_json('GET', '/favicon.ico')
+        self.assertEqual((status, data), (404, {'error': 'Not found!'}))
+
+
+class CachingHttpTest(WebServerTestCase):
+    def make_puzzle(self):
+        # has 288 solutions, so ':SOLVE-ALL' has a long response
+        return SudokuPuzzle([[''] * 4 for _ in range(4)])
+
+    def solve_all_html(self):
+        msg = Controller(self.make_puzzle(), None).act(':SOLVE-ALL')[0]
+        return bytes(msg.replace('\n', '<br>'), 'UTF-8')
+
+    def test_not_modified(self):
+        response, body = self.request('GET', '/')
+        self.assertEqual(response.status, 200)
+        with open('game.html', 'rb') as f:
+            self.assertEqual(body, f.read())
+        etag = response.getheader('ETag')
+        last_modified = response.getheader('Last-Modified')
+        for headers in [{'If-None-Match': etag},
+                        {'If-Modified-Since': last_modified}]:
+            response, body = self.request('GET', '/game.html', None, headers)
+            self.assertEqual((response.status, body), (304, b''))
+            self.assertEqual(response.getheader('ETag'), etag)
+        response, body = self.request('GET', '/', None,
+                                      {'If-None-Match': '"stale"'})
+        self.assertEqual(response.status, 200)
+
+    def test_gzip_negotiated(self):
+        plain_response, plain = self.request('GET', '/')
+        self.assertIsNone(plain_response.getheader('Content-Encoding'))
+        for accept in ['gzip', 'deflate, gzip;q=0.5']:
+            response, body = self.request('GET', '/', None,
+                                          {'Accept-Encoding': accept})
+            self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+            self.assertEqual(gzip.decompress(body), plain)
+        response, body = self.request('GET', '/', None,
+                                      {'Accept-Encoding': 'gzip;q=0'})
+        self.assertIsNone(response.getheader('Content-Encoding'))
+
+    def test_long_action_chunked(self):
+        response, plain = self.request('GET', '/actions?action=:SOLVE-ALL')
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertIsNone(response.getheader('Content-Length'))
+        self.assertGreater(len(plain), GZIP_MIN_SIZE)
+        self.assertEqual(plain, self.solve_all_html())
+        # a new game, since that one has ended
+        self.cookie = None
+        response, body = self.request('GET', '/actions?action=:SOLVE-ALL',
+                                      None, {'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_short_action_whole(self):
+        response, body = self.request('GET', '/actions?action=:HINT%201')
+        self.assertIsNone(response.getheader('Transfer-Encoding'))
+        self.assertEqual(response.getheader('Content-Length'),
+                         str(len(body)))
+
+    def test_http_1_0_whole_response(self):
+        with socket.create_connection(('localhost', self.port), 10) as sock:
+            sock.sendall(b'GET /actions?action=:SOLVE-ALL HTTP/1.0\r\n'
+                         b'Connection: keep-alive\r\n\r\n')
+            # the server closes the connection after the response
+            response = b''
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                response += data
+        head, body = response.split(b'\r\n\r\n', 1)
+        headers = head.decode('latin-1').lower().split('\r\n')
+        self.assertTrue(headers[0].endswith('200 ok'))
+        self.assertIn('connection: close', headers)
+        self.assertIn('content-length: {}'.format(len(body)), headers)
+        self.assertNotIn('transfer-encoding: chunked', headers)
+        self.assertEqual(body, self.solve_all_html())
+
+
+class JobsHttpTest(WebServerTestCase):
+    def make_puzzle(self):
+        # has far too many solutions to find them all
+        return SudokuPuzzle([[''] * 9 for _ in range(9)])
+
+    def read_event(self, response):
+        # return the name and the data of the next Server-Sent Event
+        name, lines = None, []
+        while True:
+            line = str(response.readline(), 'UTF-8').rstrip('\n')
+            if not line:
+                return name, '\n'.join(lines)
+            field, value = line.split(': ', 1)
+            if field == 'event':
+                name = value
+            else:
+                lines.append(value)
+
+    def test_start_poll_cancel_stream(self):
+        status, job = self.request_json('GET',
+                                        '/jobs/new?action=:SOLVE-ALL')
+        self.assertEqual(status, 200)
+        self.assertEqual(job['status'], 'running')
+        status, progress = self.request_json(
+            'GET', '/jobs/{}?since=0'.format(job['id']))
+        self.assertEqual((status, progress['id']), (200, job['id']))
+        self.assertEqual(len(progress['solutions']), progress['found'])
+        # stream the job on a connection of its own
+        events = http.client.HTTPConnection('localhost', self.port,
+                                            timeout=10)
+        self.addCleanup(events.close)
+        events.request('GET', '/jobs/{}/events'.format(job['id']),
+                       headers={'Cookie': self.cookie})
+        response = events.getresponse()
+        self.assertEqual(response.getheader('Content-type'),
+                         'text/event-stream')
+        name, data = self.read_event(response)
+        self.assertIn(name, ['solution', 'progress'])
+        status, progress = self.request_json(
+            'GET', '/jobs/{}/cancel'.format(job['id']))
+        self.assertEqual(status, 200)
+        while name != 'done':
+            name, data = self.read_event(response)
+        self.assertEqual(json.loads(data)['status'], 'cancelled')
+        self.assertEqual(response.read(), b'')
+
+    def test_errors(self):
+        status, data = self.request_json('GET', '/jobs/new?action=:EXIT')
+        self.assertEqual(status, 400)
+        self.assertIn('error', data)
+        for path in ['/jobs/unknown', '/jobs/unknown/events',
+                     '/jobs/unknown/cancel']:
+            status, data = self.request_json('GET', path)
+            self.assertEqual((status, data), (404, {'error': 'No such job!'}))
+        # a job of another game cannot be seen
+        status, job = self.request_json('GET',
+                                        '/jobs/new?action=:SOLVE-ALL')
+        self.request_json('GET', '/jobs/{}/cancel'.format(job['id']))
+        self.cookie = None
+        status, data = self.request_json('GET', '/jobs/' + job['id'])
+        self.assertEqual(status, 404)
+
+
+class ParallelSolveTest(unittest.TestCase):
+    def test_solve_complete_same_order(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        self.assertEqual(
+            list(map(str, parallel_solve_complete(s, 2, depth=3))),
+            list(map(str, solve_complete(s))))
+
+    def test_solve_ladder(self):
+        word_ladder = WordLadderPuzzle('care', 'mire', dictionary=TEST_WORDS)
+        self.assertTrue(parallel_solve(word_ladder, 2).is_solved())
+
+    def test_no_solution(self):
+        word_ladder = WordLadderPuzzle('care', 'mist', dictionary=TEST_WORDS)
+        self.assertIsNone(parallel_solve(word_ladder, 2, depth=2))
+
+    def test_time_limit(self):
+        with self.assertRaises(SearchInterrupted):
+            parallel_solve(ChainPuzzle(10 ** 7), 2, time_limit=0.2)
+        with self.assertRaises(SearchInterrupted):
+            parallel_solve_complete(ChainPuzzle(10 ** 7), 2, time_limit=0.2)
+
+    def test_controller_workers(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', ''],
+                          ['', '', '', '']])
+        c = Controller(s, None, workers=2)
+        self.assertEqual(c.act(':SOLVE-ALL'), (
+            '\n'.join(map(str, solve_complete(s))), True))
+        # any branch may find its solution first
+        msg, should_quit = c.new_game().act(':SOLVE')
+        self.assertIn(msg, map(str, solve_complete(s)))
+        self.assertTrue(should_quit)
+
+
+class ChainPuzzle(Puzzle):
+    # A puzzle with a single sequence of <steps> moves, for testing
+    # searches much deeper than Python's recursion limit.
+    def __init__(self, steps):
+        self._steps = steps
+
+    def __str__(self):
+        return str(self._steps)
+
+    def is_solved(self):
+        return self._steps == 0
+
+    def extensions(self):
+        return [ChainPuzzle(self._steps - 1)] if self._steps else []
+
+    def compare(self, state):
+        return str(state)
+
+
+class DeepSolveTest(unittest.TestCase):
+    def test_solve(self):
+        self.assertTrue(solve(ChainPuzzle(5000)).is_solved())
+
+    def test_solve_complete(self):
+        self.assertEqual(len(solve_complete(ChainPuzzle(5000))), 1)
+
+    def test_hint(self):
+        self.assertEqual(hint_by_depth(ChainPuzzle(5000), 5000), '4999')
+
+    def test_controller_hint_without_key(self):
+        c = Controller(ChainPuzzle(3), None)
+        self.assertEqual(c.act(':HINT 5'), ('2', False))
+
+
+class BestFirstTest(unittest.TestCase):
+    def test_ladder_shortest(self):
+        word_ladder = WordLadderPuzzle('cold', 'warm')
+        ladder = solve_best_first(word_ladder)
+        self.assertTrue(ladder.is_solved())
+        self.assertEqual(len(str(ladder).split()),
+                         len(str(word_ladder.shortest_ladder()).split()))
+
+    def test_ladder_no_solution(self):
+        word_ladder = WordLadderPuzzle('care', 'mist', dictionary=TEST_WORDS)
+        self.assertIsNone(solve_best_first(word_ladder))
+        self.assertIsNone(solve_best_first(
+            WordLadderPuzzle('care', 'zzzz', dictionary=TEST_WORDS)))
+
+    def test_sudoku_nine(self):
+        s = SudokuPuzzle([['E', 'C', '', '', 'G', '', '', '', ''],
+                          ['F', '', '', 'A', 'I', 'E', '', '', ''],
+                          ['', 'I', 'H', '', '', '', '', 'F', ''],
+                          ['H', '', '', '', 'F', '', '', '', 'C'],
+                          ['D', '', '', 'H', '', 'C', '', '', 'A'],
+                          ['G', '', '', '', 'B', '', '', '', 'F'],
+                          ['', 'F', '', '', '', '', 'B', 'H', ''],
+                          ['', '', '', 'D', 'A', 'I', '', '', 'E'],
+                          ['', '', '', '', 'H', '', '', 'G', 'I']],
+                         'mrv', True)
+        self.assertEqual(solve_best_first(s), s.direct_solve())
+
+    def test_sudoku_dead_end_pruned(self):
+        s = SudokuPuzzle([['', 'B', 'C', ''],
+                          ['', 'A', '', ''],
+                          ['D', '', '', ''],
+                          ['', '', '', '']])
+        stats = SearchStats()
+        self.assertIsNone(solve_best_first(s, stats=stats))
+        self.assertEqual(stats.nodes, 0)
+
+    def test_without_heuristic(self):
+        self.assertTrue(solve_best_first(ChainPuzzle(5000)).is_solved())
+
+    def test_node_limit(self):
+        empty = SudokuPuzzle([[''] * 9 for _ in range(9)])
+        with self.assertRaises(SearchInterrupted) as cm:
+            solve_best_first(empty, node_limit=10)
+        self.assertEqual(cm.exception.partial.heuristic(), 72)
+
+
 class SolveTest(unittest.TestCase):
     def test_solve_one(self):
         s = SudokuPuzzle([['A', 'B', 'C', 'D'],
@@ -162,6 +1121,7 @@ class SolveTest(unittest.TestCase):
                           ['B', 'A', '', ''],
                           ['D', 'C', '', '']])
         solved = solve(s)
+        self.assertEqual(str(solve(s, direct=True)), str(solved))
         # Note: when we run our tests, we will replace
         # this with our own "is_solved" method
         # to make sure the puzzle is correctly solved.
@@ -180,6 +1140,20 @@ class SolveTest(unittest.TestCase):
         for solution in solutions:
             self.assertTrue(solution.is_solved())
 
+    def test_iter_solutions(self):
+        s = SudokuPuzzle([['A', 'B', '', ''],
+                          ['C', 'D', '', ''],
+                          ['B', '', '', ''],
+                          ['D', '', 'A', '']])
+        self.assertEqual(list(map(str, iter_solutions(s))),
+                         list(map(str, solve_complete(s))))
+        self.assertEqual(len(list(iter_solutions(s, limit=1))), 1)
+
+    def test_iter_solutions_lazy(self):
+        empty = SudokuPuzzle([[''] * 9 for _ in range(9)])
+        first = next(iter_solutions(empty))
+        self.assertTrue(first.is_solved())
+
     def test_hint_already_solved(self):
         s = SudokuPuzzle([['A', 'B', 'C', 'D'],
                           ['C', 'D', 'A', 'B'],
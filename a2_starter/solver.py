@@ -7,12 +7,395 @@
 This module can be used to take a puzzle and generate one or all
 possible solutions. It can also generate hints for a puzzle (see Part 4).
 """
+from collections import OrderedDict
+from heapq import heappush, heappop
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import Manager
+from threading import Condition, Event, Thread
+from time import perf_counter
 from puzzle import Puzzle
 from sudoku_puzzle import SudokuPuzzle
 from word_ladder_puzzle import WordLadderPuzzle
 
+# Returned by TranspositionTable.get for keys it does not hold
+MISSING = object()
+# How many states a search explores between checks of its time limit
+# and of cancellation
+CANCEL_CHECK_INTERVAL = 256
 
-def solve(puzzle, verbose=False):
+
+class TranspositionTable:
+    """A bounded cache of what searches learned about puzzle states.
+
+    Entries are keyed by puzzle keys (see Puzzle.key), so a state reached
+    by a different sequence of moves finds the entry of the first one.
+    When the table is full, the least recently used entry is dropped.
+
+    The same table can be passed to several searches on the same puzzle.
+    solve and solve_complete record the states which lead to no solution,
+    and skip them when they meet them again; hint_by_depth records the
+    results of its bounded searches.
+    """
+    # === Attributes ===
+    # @type hits: int
+    #     The number of lookups which found an entry
+    # @type misses: int
+    #     The number of lookups which found nothing
+    # === Private attributes ===
+    # @type _maxsize: int
+    #     The maximum number of entries
+    # @type _entries: OrderedDict
+    #     The entries, from least to most recently used
+
+    def __init__(self, maxsize=100000):
+        """Create a new empty table holding at most <maxsize> entries.
+
+        @type self: TranspositionTable
+        @type maxsize: int
+        @rtype: None
+        """
+        self.hits = 0
+        self.misses = 0
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Return the number of entries in the table.
+
+        @type self: TranspositionTable
+        @rtype: int
+        """
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the value stored for <key>, or MISSING if there is none.
+
+        @type self: TranspositionTable
+        @type key: object
+        @rtype: object
+
+        >>> table = TranspositionTable(2)
+        >>> table.put('a', 1)
+        >>> table.get('a'), table.get('b') is MISSING
+        (1, True)
+        >>> table.hits, table.misses
+        (1, 1)
+        """
+        value = self._entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store <value> for <key>, dropping the least recently used entry
+        if the table is full.
+
+        @type self: TranspositionTable
+        @type key: object
+        @type value: object
+        @rtype: None
+
+        >>> table = TranspositionTable(2)
+        >>> table.put('a', 1)
+        >>> table.put('b', 2)
+        >>> _ = table.get('a')
+        >>> table.put('c', 3)
+        >>> table.get('b') is MISSING, len(table)
+        (True, 2)
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
+class SearchStats:
+    """Statistics collected by a search.
+
+    Pass one to solve, solve_complete, iter_solutions, solve_best_first or
+    hint_by_depth to find out how much work the search did and where its
+    time went. The same collector can be passed to several searches to add
+    them up.
+
+    A state is expanded when its extensions are generated. A dead end is
+    an expanded state with no extensions at all. The root of the search
+    is at depth 0. In 'direct' mode the puzzle's own algorithm expands
+    no states; only the steps it takes are counted.
+    """
+    # === Attributes ===
+    # @type nodes: int
+    #     The number of states expanded
+    # @type children: int
+    #     The number of extensions generated in total
+    # @type dead_ends: int
+    #     The number of expanded states with no extensions
+    # @type max_depth: int
+    #     The depth of the deepest state expanded
+    # @type checks: int
+    #     The number of calls to is_solved
+    # @type extensions_time: float
+    #     The seconds spent in extensions
+    # @type is_solved_time: float
+    #     The seconds spent in is_solved
+    # @type steps: int
+    #     The number of steps taken by the puzzle's own algorithm
+
+    def __init__(self):
+        """Create a new collector with nothing recorded.
+
+        @type self: SearchStats
+        @rtype: None
+        """
+        self.nodes = 0
+        self.children = 0
+        self.dead_ends = 0
+        self.max_depth = 0
+        self.checks = 0
+        self.extensions_time = 0.0
+        self.is_solved_time = 0.0
+        self.steps = 0
+
+    def __str__(self):
+        """Return a human-readable summary of the statistics.
+
+        @type self: SearchStats
+        @rtype: str
+
+        >>> stats = SearchStats()
+        >>> _ = solve(WordLadderPuzzle('ye', 'ac'), stats=stats)
+        >>> print(str(stats).splitlines()[0])
+        states expanded: 4
+        """
+        return '\n'.join([
+            'states expanded: {}'.format(self.nodes),
+            'dead ends: {}'.format(self.dead_ends),
+            'maximum depth: {}'.format(self.max_depth),
+            'branching factor: {:.2f}'.format(self.branching_factor()),
+            'time in extensions: {:.3f} s'.format(self.extensions_time),
+            'time in is_solved: {:.3f} s ({} calls)'.format(
+                self.is_solved_time, self.checks),
+            'steps of the puzzle\'s own algorithm: {}'.format(self.steps)])
+
+    def branching_factor(self):
+        """Return the average number of extensions of an expanded state.
+
+        @type self: SearchStats
+        @rtype: float
+
+        >>> stats = SearchStats()
+        >>> stats.branching_factor()
+        0.0
+        >>> _ = stats.extensions(WordLadderPuzzle('ye', 'ac'), 0)
+        >>> stats.branching_factor() == stats.children
+        True
+        """
+        if self.nodes == 0:
+            return 0.0
+        return self.children / self.nodes
+
+    def extensions(self, puzzle, depth):
+        """Return the extensions of <puzzle>, a state at <depth>, and
+        record its expansion.
+
+        @type self: SearchStats
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: list[Puzzle]
+        """
+        start = perf_counter()
+        states = puzzle.extensions()
+        self.extensions_time += perf_counter() - start
+        self.nodes += 1
+        self.children += len(states)
+        if not states:
+            self.dead_ends += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return states
+
+    def is_solved(self, puzzle):
+        """Return whether <puzzle> is solved, and record the check.
+
+        @type self: SearchStats
+        @type puzzle: Puzzle
+        @rtype: bool
+        """
+        start = perf_counter()
+        solved = puzzle.is_solved()
+        self.is_solved_time += perf_counter() - start
+        self.checks += 1
+        return solved
+
+
+def _instruments(stats):
+    """Return the functions a search should call instead of the
+    'extensions' and 'is_solved' methods of its states, to record its
+    work in <stats> if it is not None.
+
+    @type stats: SearchStats | None
+    @rtype: (function, function)
+    """
+    if stats is None:
+        return _extensions, _is_solved
+    return stats.extensions, stats.is_solved
+
+
+def _spender(budget, stats):
+    """Return the function the puzzle's own algorithm should call for
+    each of its steps, to spend <budget> and count the step in <stats>;
+    or None if both are None.
+
+    @type budget: _Budget | None
+    @type stats: SearchStats | None
+    @rtype: function | None
+    """
+    if stats is None:
+        return None if budget is None else budget.spend
+
+    def spend():
+        """Count one step, and spend the budget if there is one.
+
+        @rtype: None
+        """
+        stats.steps += 1
+        if budget is not None:
+            budget.spend()
+    return spend
+
+
+def _extensions(puzzle, depth):
+    """Return the extensions of <puzzle>; used when there are no stats.
+
+    @type puzzle: Puzzle
+    @type depth: int
+    @rtype: list[Puzzle]
+    """
+    return puzzle.extensions()
+
+
+def _is_solved(puzzle):
+    """Return whether <puzzle> is solved; used when there are no stats.
+
+    @type puzzle: Puzzle
+    @rtype: bool
+    """
+    return puzzle.is_solved()
+
+
+class SearchInterrupted(Exception):
+    """Raised when a search runs out of its budget or is cancelled.
+
+    <reason> is 'time', 'nodes' or 'cancelled'. <nodes> is the number of
+    states the search explored. <partial> is what the search had achieved
+    so far; see the function which raised it.
+    """
+
+    def __init__(self, reason, nodes, partial=None):
+        """Create a new exception.
+
+        @type self: SearchInterrupted
+        @type reason: str
+        @type nodes: int
+        @type partial: object
+        @rtype: None
+        """
+        Exception.__init__(self, reason, nodes, partial)
+        self.reason = reason
+        self.nodes = nodes
+        self.partial = partial
+
+    def __str__(self):
+        """Return a human-readable description of why the search stopped.
+
+        @type self: SearchInterrupted
+        @rtype: str
+
+        >>> print(SearchInterrupted('time', 512))
+        Search stopped after 512 states: out of time.
+        """
+        why = {'time': 'out of time', 'nodes': 'too many states',
+               'cancelled': 'cancelled'}[self.reason]
+        return 'Search stopped after {} states: {}.'.format(self.nodes, why)
+
+
+class _Budget:
+    """The limits on the work a search may do."""
+    # === Attributes ===
+    # @type nodes: int
+    #     The number of states explored so far
+    # === Private attributes ===
+    # @type _deadline: float | None
+    #     The perf_counter time at which to stop
+    # @type _node_limit: int | None
+    #     The number of states after which to stop
+    # @type _cancel: threading.Event | None
+    #     The event which stops the search once it is set
+
+    def __init__(self, time_limit, node_limit, cancel):
+        """Start the budget of a search.
+
+        @type self: _Budget
+        @type time_limit: float | None
+        @type node_limit: int | None
+        @type cancel: threading.Event | None
+        @rtype: None
+        """
+        self.nodes = 0
+        self._deadline = (None if time_limit is None
+                          else perf_counter() + time_limit)
+        self._node_limit = node_limit
+        self._cancel = cancel
+
+    def spend(self, partial=None):
+        """Count one more state explored.
+
+        Raise SearchInterrupted, with <partial>, if that exceeds the
+        budget. The time limit and the cancellation are only checked
+        every CANCEL_CHECK_INTERVAL states.
+
+        @type self: _Budget
+        @type partial: object
+        @rtype: None
+
+        >>> budget = _Budget(None, 2, None)
+        >>> budget.spend()
+        >>> budget.spend()
+        >>> try:
+        ...     budget.spend()
+        ... except SearchInterrupted as e:
+        ...     print(e.reason, e.nodes)
+        nodes 2
+        """
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchInterrupted('nodes', self.nodes, partial)
+        self.nodes += 1
+        if self.nodes % CANCEL_CHECK_INTERVAL == 0:
+            if self._deadline is not None and perf_counter() >= self._deadline:
+                raise SearchInterrupted('time', self.nodes, partial)
+            if self._cancel is not None and self._cancel.is_set():
+                raise SearchInterrupted('cancelled', self.nodes, partial)
+
+
+def _budget(time_limit, node_limit, cancel):
+    """Return the budget of a search with these limits, or None if it
+    has none.
+
+    @type time_limit: float | None
+    @type node_limit: int | None
+    @type cancel: threading.Event | None
+    @rtype: _Budget | None
+    """
+    if time_limit is None and node_limit is None and cancel is None:
+        return None
+    return _Budget(time_limit, node_limit, cancel)
+
+
+def solve(puzzle, verbose=False, direct=False, table=None, cancel=None,
+          stats=None, time_limit=None, node_limit=None):
     """Return a solution of the puzzle.
 
     Even if there is only one possible solution, just return one of them.
@@ -21,12 +404,41 @@ def solve(puzzle, verbose=False):
     In 'verbose' mode, print out every state explored in addition to
     the final solution. By default 'verbose' mode is disabled.
 
-    Uses a recursive algorithm to exhaustively try all possible
+    In 'direct' mode, use the puzzle's own algorithm (its 'direct_solve'
+    method) if it has one, e.g. the shortest ladder for a word ladder.
+    Nothing is printed in that case. By default 'direct' mode is disabled.
+
+    If a transposition <table> is given, states already found to lead
+    to no solution are not explored again. The puzzle must implement
+    'key' for this.
+
+    The search can be given a budget: at most <time_limit> seconds, and
+    at most <node_limit> states explored. If <cancel> is given, it is an
+    event (e.g. a threading.Event) checked every CANCEL_CHECK_INTERVAL
+    states, like the time limit. If the search runs out of budget or is
+    cancelled, it raises SearchInterrupted, whose 'partial' attribute is
+    the deepest state of the path it was exploring. The budget applies
+    to the puzzle's own algorithm in 'direct' mode too, which is given
+    it through the 'spend' argument of direct_solve; 'partial' is then
+    None.
+
+    If a SearchStats collector <stats> is given, the work done by the
+    search is recorded in it.
+
+    Uses a depth-first search to exhaustively try all possible
     sequences of moves (using the 'extensions' method of the Puzzle
-    interface) until it finds a solution.
+    interface) until it finds a solution. The search keeps its own
+    stack instead of recursing, so it is not limited by Python's
+    recursion limit.
 
     @type puzzle: Puzzle
     @type verbose: bool
+    @type direct: bool
+    @type table: TranspositionTable | None
+    @type cancel: threading.Event | None
+    @type stats: SearchStats | None
+    @type time_limit: float | None
+    @type node_limit: int | None
     @rtype: Puzzle | None
 
     >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
@@ -43,25 +455,68 @@ def solve(puzzle, verbose=False):
     >>> w = WordLadderPuzzle('ye', 'ac')
     >>> print(solve(w))
     ye be bb ab ac
+    >>> print(solve(w, direct=True))
+    ye de dc ac
+    >>> try:
+    ...     solve(w, node_limit=2)
+    ... except SearchInterrupted as e:
+    ...     print(e, e.partial)
+    Search stopped after 2 states: too many states. ye be bb
     """
+    # keep to the budget if there is one
+    budget = _budget(time_limit, node_limit, cancel)
+    # if in direct mode
+    if direct:
+        # try the puzzle's own algorithm, on the same budget
+        try:
+            return puzzle.direct_solve(_spender(budget, stats))
+        # if it has none, fall back on the search below
+        except NotImplementedError:
+            pass
+    # record the work done if there is a collector
+    extensions, is_solved = _instruments(stats)
     # if the puzzle has been solved
-    if puzzle.is_solved():
+    if is_solved(puzzle):
         # get the puzzle
         return puzzle
-    # loop the list of all possible moves according to the current state
-    for state in puzzle.extensions():
-        # recursively get the new state
-        state_new = solve(state, verbose)
-        # if the new state exist
-        if state_new:
+    # the states on the current path, below <puzzle>
+    path = []
+    # the extensions still to try at each level of the path
+    stack = [iter(extensions(puzzle, 0))]
+    while stack:
+        # get the next extension to try at the deepest level
+        state = next(stack[-1], None)
+        # if it is over the budget, give up
+        if budget is not None and state is not None:
+            budget.spend(path[-1] if path else puzzle)
+        # if there are none left, go back up one level
+        if state is None:
+            stack.pop()
+            if path:
+                dead = path.pop()
+                # remember that it leads to no solution
+                if table is not None:
+                    table.put(dead.key(), False)
+        # if the state is solved
+        elif is_solved(state):
             # if it is in verbose mode
             if verbose:
-                # print the state
-                print(state)
-            return state_new
+                # print the path, from the solution upwards
+                for step in reversed(path + [state]):
+                    print(step)
+            return state
+        # if it is known to lead to no solution, skip it
+        elif table is not None and table.get(state.key()) is False:
+            pass
+        # otherwise try the extensions of the state
+        else:
+            path.append(state)
+            stack.append(iter(extensions(state, len(path))))
+    return None
 
 
-def solve_complete(puzzle, verbose=False):
+def solve_complete(puzzle, verbose=False, direct=False, table=None,
+                   stats=None, time_limit=None, node_limit=None, cancel=None):
     """Return all solutions of the puzzle.
 
     Return an empty list if there are no possible solutions.
@@ -69,12 +524,29 @@ def solve_complete(puzzle, verbose=False):
     In 'verbose' mode, print out every state explored in addition to
     the final solution. By default 'verbose' mode is disabled.
 
-    Uses a recursive algorithm to exhaustively try all possible
+    In 'direct' mode, use the puzzle's own algorithm (its
+    'direct_iter_solutions' method) if it has one. Nothing is printed
+    in that case. By default 'direct' mode is disabled.
+
+    A transposition <table>, a collector of <stats> and the budget
+    <time_limit>, <node_limit> and <cancel> are used as in 'solve',
+    including by the puzzle's own algorithm (see iter_solutions). If the
+    search runs out of budget, the 'partial' attribute of the
+    SearchInterrupted it raises is the list of the solutions found so far.
+
+    Uses a depth-first search to exhaustively try all possible
     sequences of moves (using the 'extensions' method of the Puzzle
-    interface) until it finds all solutions.
+    interface) until it finds all solutions. The search keeps its own
+    stack instead of recursing.
 
     @type puzzle: Puzzle
     @type verbose: bool
+    @type direct: bool
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
+    @type time_limit: float | None
+    @type node_limit: int | None
+    @type cancel: threading.Event | None
     @rtype: list[Puzzle]
 
     >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
@@ -97,32 +569,525 @@ def solve_complete(puzzle, verbose=False):
     2|CD|AB
     3|BA|DC
     <BLANKLINE>
+    >>> len(solve_complete(s, direct=True))
+    2
+    >>> try:
+    ...     solve_complete(s, node_limit=7)
+    ... except SearchInterrupted as e:
+    ...     print(len(e.partial))
+    1
     """
     # create a new empty list
     result = []
+    try:
+        for state in iter_solutions(puzzle, verbose=verbose, direct=direct,
+                                    table=table, stats=stats,
+                                    time_limit=time_limit,
+                                    node_limit=node_limit, cancel=cancel):
+            result.append(state)
+    # if it ran out of budget, the progress is the solutions found
+    except SearchInterrupted as e:
+        e.partial = result
+        raise
+    return result
+
+
+def iter_solutions(puzzle, limit=None, verbose=False, direct=False,
+                   table=None, stats=None, time_limit=None, node_limit=None,
+                   cancel=None):
+    """Yield the solutions of the puzzle as they are found.
+
+    The solutions are the same, and in the same order, as those of
+    solve_complete, but each one is yielded as soon as it is found,
+    so the first solution is available right away and they need not all
+    be kept in memory. Stop after <limit> solutions if <limit> is not None.
+
+    The 'verbose' and 'direct' modes, the transposition <table>, the
+    collector of <stats> and the budget are the same as for
+    solve_complete, except that the 'partial' attribute of
+    SearchInterrupted is the deepest state of the path being explored:
+    the solutions found so far have already been yielded.
+    In 'direct' mode, the puzzle's own algorithm (its
+    'direct_iter_solutions' method) is given the budget, and a
+    SearchInterrupted it raises has no 'partial' state. An algorithm
+    which returns all of its solutions at once, as by default, cannot be
+    stopped before it returns them.
+
+    @type puzzle: Puzzle
+    @type limit: int | None
+    @type verbose: bool
+    @type direct: bool
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
+    @type time_limit: float | None
+    @type node_limit: int | None
+    @type cancel: threading.Event | None
+    @rtype: iterator[Puzzle]
+
+    >>> s = SudokuPuzzle([['', '', '', ''], ['', '', '', ''], \
+    ['', '', '', ''], ['', '', '', '']])
+    >>> solutions = iter_solutions(s)
+    >>> print(next(solutions))
+      01|23
+     ------
+    0|AB|CD
+    1|CD|AB
+     ------
+    2|BA|DC
+    3|DC|BA
+    <BLANKLINE>
+    >>> len(list(iter_solutions(s, limit=10)))
+    10
+    """
+    # if no solutions are wanted, there is nothing to do
+    if limit is not None and limit <= 0:
+        return
+    # keep to the budget if there is one
+    budget = _budget(time_limit, node_limit, cancel)
+    # if in direct mode
+    if direct:
+        # try the puzzle's own algorithm, on the same budget
+        try:
+            states = puzzle.direct_iter_solutions(_spender(budget, stats))
+        # if it has none, fall back on the search below
+        except NotImplementedError:
+            pass
+        # otherwise yield its solutions, up to the limit
+        else:
+            for count, state in enumerate(states, 1):
+                yield state
+                if count == limit:
+                    return
+            return
+    # record the work done if there is a collector
+    extensions, is_solved = _instruments(stats)
     # if the puzzle has been solved
-    if puzzle.is_solved():
-        # add the puzzle to the new list
-        result = [puzzle]
-    # otherwise
-    else:
-        # loop the list of all possible moves according to the current state
-        for state in puzzle.extensions():
-            # recursively get the new state
-            states_new = solve_complete(state, verbose)
-            # if the new state exist
-            if states_new:
-                # if in the verbose mode
-                if verbose:
-                    # print the state
-                    print(state)
-                # add the new state puzzle to the new list
-                result += states_new
+    if is_solved(puzzle):
+        # it is the only solution
+        yield puzzle
+        return
+    # the number of solutions found
+    count = 0
+    # for each level of the current path: its state, the extensions still
+    # to try, and the number of solutions found before reaching it
+    stack = [(None, iter(extensions(puzzle, 0)), 0)]
+    while stack:
+        # get the next extension to try at the deepest level
+        state = next(stack[-1][1], None)
+        # if it is over the budget, give up
+        if budget is not None and state is not None:
+            parent = stack[-1][0]
+            budget.spend(puzzle if parent is None else parent)
+        # if there are none left, go back up one level
+        if state is None:
+            parent, _, found = stack.pop()
+            # if in the verbose mode and the state led to solutions
+            if verbose and parent is not None and count > found:
+                # print the state
+                print(parent)
+            # if it led to no solution, remember that
+            elif table is not None and parent is not None and count == found:
+                table.put(parent.key(), False)
+        # if the state is solved
+        elif is_solved(state):
+            count += 1
+            # if in the verbose mode
+            if verbose:
+                # print the state
+                print(state)
+            yield state
+            # if that was the last solution wanted
+            if count == limit:
+                return
+        # if it is known to lead to no solution, skip it
+        elif table is not None and table.get(state.key()) is False:
+            pass
+        # otherwise try the extensions of the state
+        else:
+            stack.append((state, iter(extensions(state, len(stack))), count))
+
+
+def solve_best_first(puzzle, stats=None, time_limit=None, node_limit=None,
+                     cancel=None):
+    """Return a cheapest solution of the puzzle, or None if there is none.
+
+    Uses an A* search: the states are explored in order of the cost of
+    the moves made to reach them (see Puzzle.cost) plus the estimate of
+    the cost left (see Puzzle.heuristic), kept in a binary heap. Among
+    states with the same total, those closer to a solution come first.
+    States whose estimate is infinite are dropped. The solution is a
+    cheapest one as long as the estimates are never too high; for
+    a puzzle with no heuristic, it is one with the fewest moves.
+
+    If the puzzle implements 'key', a state reached again by moves
+    which cost no less than before is not explored again.
+
+    A collector of <stats> and the budget <time_limit>, <node_limit> and
+    <cancel> are used as in 'solve'. If the search runs out of budget,
+    the 'partial' attribute of the SearchInterrupted it raises is the
+    state explored so far with the lowest estimate.
+
+    @type puzzle: Puzzle
+    @type stats: SearchStats | None
+    @type time_limit: float | None
+    @type node_limit: int | None
+    @type cancel: threading.Event | None
+    @rtype: Puzzle | None
+
+    >>> print(solve_best_first(WordLadderPuzzle('ye', 'ac')))
+    ye de dc ac
+    >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
+    ['', 'D', '', ''], ['', '', '', '']])
+    >>> solve_best_first(s).is_solved()
+    True
+    """
+    # record the work done if there is a collector
+    extensions, is_solved = _instruments(stats)
+    # keep to the budget if there is one
+    budget = _budget(time_limit, node_limit, cancel)
+    estimate = puzzle.heuristic()
+    # if the puzzle is known to lead nowhere
+    if estimate == float('inf'):
+        return None
+    # the lowest cost found to reach each state, if states have keys
+    try:
+        reached = {puzzle.key(): 0}
+    except NotImplementedError:
+        reached = None
+    # the state with the lowest estimate so far
+    best, best_estimate = puzzle, estimate
+    # the heap of (total, estimate, order, cost, depth, state); the order
+    # keeps states from being compared and breaks the remaining ties
+    # first in, first out
+    order = 0
+    heap = [(estimate, estimate, order, 0, 0, puzzle)]
+    while heap:
+        _, estimate, _, cost, depth, state = heappop(heap)
+        # if the state is solved, no cheaper solution is left
+        if is_solved(state):
+            return state
+        # if it was reached more cheaply since it was pushed, skip it
+        if reached is not None and reached[state.key()] < cost:
+            continue
+        # if it is over the budget, give up
+        if budget is not None:
+            budget.spend(best)
+        if estimate < best_estimate:
+            best, best_estimate = state, estimate
+        # loop the extensions of the state
+        for child in extensions(state, depth):
+            child_estimate = child.heuristic()
+            # if it leads nowhere, drop it
+            if child_estimate == float('inf'):
+                continue
+            child_cost = cost + state.cost(child)
+            if reached is not None:
+                key = child.key()
+                # if it was already reached as cheaply, drop it
+                if reached.get(key, float('inf')) <= child_cost:
+                    continue
+                reached[key] = child_cost
+            order += 1
+            heappush(heap, (child_cost + child_estimate, child_estimate,
+                            order, child_cost, depth + 1, child))
+    return None
+
+
+class SolveJob:
+    """A search for the solutions of a puzzle, running on a thread of
+    its own.
+
+    Start it with 'start'. While it runs, other threads can read how far
+    it got from 'stats' and 'solutions', wait for news with
+    'wait_for_change', and stop it with 'cancel'.
+    """
+    # === Attributes ===
+    # @type stats: SearchStats
+    #     The work done so far
+    # @type solutions: list[Puzzle]
+    #     The solutions found so far, in the order of iter_solutions
+    # @type status: str
+    #     'running'; then 'done' if the search finished, 'cancelled' if
+    #     it was cancelled, 'stopped' if it ran out of budget, or
+    #     'failed' if it raised an error
+    # @type message: str
+    #     Why the search did not finish, if it did not
+    # === Private attributes ===
+    # @type _puzzle: Puzzle
+    #     The puzzle to solve
+    # @type _options: dict
+    #     The arguments passed to iter_solutions
+    # @type _cancel: threading.Event
+    #     Set to stop the search
+    # @type _changed: threading.Condition
+    #     Notified when a solution is found and when the search ends
+
+    def __init__(self, puzzle, limit=None, direct=False, time_limit=None,
+                 node_limit=None):
+        """Create a new job looking for the solutions of <puzzle>.
+
+        The arguments are those of iter_solutions. In 'direct' mode the
+        puzzle's own algorithm counts its work in the 'steps' of the
+        stats rather than in 'nodes', and can only be cancelled if it
+        takes the budget (see Puzzle.direct_iter_solutions).
+
+        @type self: SolveJob
+        @type puzzle: Puzzle
+        @type limit: int | None
+        @type direct: bool
+        @type time_limit: float | None
+        @type node_limit: int | None
+        @rtype: None
+        """
+        self.stats = SearchStats()
+        self.solutions = []
+        self.status = 'running'
+        self.message = ''
+        self._puzzle = puzzle
+        self._options = {'limit': limit, 'direct': direct,
+                         'time_limit': time_limit, 'node_limit': node_limit}
+        self._cancel = Event()
+        self._changed = Condition()
+
+    def start(self):
+        """Start the search on a new thread, and return this job.
+
+        @type self: SolveJob
+        @rtype: SolveJob
+
+        >>> job = SolveJob(WordLadderPuzzle('ye', 'ac'), limit=1).start()
+        >>> job.wait_for_change(0, 10)
+        True
+        >>> job.wait_for_change(1, 10)
+        True
+        >>> job.status, [str(x) for x in job.solutions]
+        ('done', ['ye be bb ab ac'])
+        """
+        Thread(target=self._run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Ask the search to stop as soon as it can.
+
+        @type self: SolveJob
+        @rtype: None
+        """
+        self._cancel.set()
+
+    def finished(self):
+        """Return whether the search has ended, for whatever reason.
+
+        @type self: SolveJob
+        @rtype: bool
+        """
+        return self.status != 'running'
+
+    def wait_for_change(self, seen, timeout=None):
+        """Wait until there are more than <seen> solutions or the search
+        has ended, for at most <timeout> seconds.
+
+        Return whether that happened before the timeout.
+
+        @type self: SolveJob
+        @type seen: int
+        @type timeout: float | None
+        @rtype: bool
+        """
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: len(self.solutions) > seen or self.finished(),
+                timeout)
+
+    def _run(self):
+        """Run the search, recording what it finds.
+
+        @type self: SolveJob
+        @rtype: None
+        """
+        status, message = 'done', ''
+        try:
+            for state in iter_solutions(self._puzzle, stats=self.stats,
+                                        cancel=self._cancel, **self._options):
+                with self._changed:
+                    self.solutions.append(state)
+                    self._changed.notify_all()
+                # the puzzle's own algorithm does not check for cancellation
+                if self._cancel.is_set():
+                    raise SearchInterrupted('cancelled', self.stats.nodes)
+        except SearchInterrupted as e:
+            status = 'cancelled' if e.reason == 'cancelled' else 'stopped'
+            message = str(e)
+        except Exception as e:
+            status, message = 'failed', str(e)
+        with self._changed:
+            self.status, self.message = status, message
+            self._changed.notify_all()
+
+
+def parallel_solve(puzzle, workers=None, depth=1, time_limit=None):
+    """Return a solution of the puzzle, searching on several processes.
+
+    The states reachable in <depth> moves are found first; then each of
+    them is searched by 'solve' in a pool of <workers> processes (by
+    default, one per core). As soon as one of them finds a solution, the
+    others are cancelled. If there are several solutions, any one of them
+    may be returned. If there are no possible solutions, return None.
 
+    If no solution is found within <time_limit> seconds, every search is
+    cancelled and SearchInterrupted is raised; its 'nodes' are those
+    explored by the searches which were still running.
+
+    The puzzle states must be picklable.
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type depth: int
+    @type time_limit: float | None
+    @rtype: Puzzle | None
+
+    >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
+    ['', 'D', '', ''], ['', '', '', '']])
+    >>> parallel_solve(s, 2).is_solved()
+    True
+    """
+    states = []
+    # loop the states after <depth> moves
+    for state, solved in _split(puzzle, depth):
+        # if it is already solved, there is no need to search
+        if solved:
+            return state
+        states.append(state)
+    # if there is nothing left to search
+    if not states:
+        return None
+    with Manager() as manager, ProcessPoolExecutor(workers) as executor:
+        # the event telling every search to stop
+        cancel = manager.Event()
+        futures = [executor.submit(solve, state, cancel=cancel)
+                   for state in states]
+        try:
+            # loop the searches as they finish
+            for future in as_completed(futures, time_limit):
+                state = future.result()
+                # if a solution is found, the other searches stop below
+                if state is not None:
+                    return state
+        # if it took too long, stop every search
+        except FutureTimeoutError:
+            raise SearchInterrupted('time', _stop(futures, cancel))
+        finally:
+            cancel.set()
+            for other in futures:
+                other.cancel()
+    return None
+
+
+def parallel_solve_complete(puzzle, workers=None, depth=1,
+                            time_limit=None):
+    """Return all solutions of the puzzle, searching on several processes.
+
+    The states reachable in <depth> moves are found first; then each of
+    them is searched by 'solve_complete' in a pool of <workers> processes
+    (by default, one per core). The solutions are returned in the same
+    order as by 'solve_complete'.
+
+    If the searches are not all done within <time_limit> seconds, the
+    ones left are cancelled and SearchInterrupted is raised, as by
+    parallel_solve; its 'partial' attribute is the list of the solutions
+    found so far, in order.
+
+    The puzzle states must be picklable.
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type depth: int
+    @type time_limit: float | None
+    @rtype: list[Puzzle]
+
+    >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
+    ['', 'D', '', ''], ['', '', '', '']])
+    >>> [str(x) for x in parallel_solve_complete(s, 2)] == \
+    [str(x) for x in solve_complete(s)]
+    True
+    """
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    split = _split(puzzle, depth)
+    # create a new empty list
+    result = []
+    with Manager() as manager, ProcessPoolExecutor(workers) as executor:
+        # the event telling every search to stop
+        cancel = manager.Event()
+        # search from every state which is not solved yet
+        futures = [None if solved else
+                   executor.submit(solve_complete, state, cancel=cancel)
+                   for state, solved in split]
+        try:
+            # collect the solutions in the order of the states
+            for (state, solved), future in zip(split, futures):
+                if solved:
+                    result.append(state)
+                else:
+                    result += future.result(
+                        None if deadline is None
+                        else max(0, deadline - perf_counter()))
+        # if it took too long, stop the searches left
+        except FutureTimeoutError:
+            nodes = _stop([f for f in futures if f is not None], cancel)
+            raise SearchInterrupted('time', nodes, result)
     return result
 
 
-def hint_by_depth(puzzle, n):
+def _stop(futures, cancel):
+    """Stop the searches of <futures> by setting the event <cancel>, wait
+    for those already running, and return the number of states they
+    explored.
+
+    @type futures: list[concurrent.futures.Future]
+    @type cancel: threading.Event
+    @rtype: int
+    """
+    cancel.set()
+    nodes = 0
+    for future in futures:
+        # a search which has not started never will
+        if future.cancel():
+            continue
+        try:
+            future.result()
+        except SearchInterrupted as e:
+            nodes += e.nodes
+    return nodes
+
+
+def _split(puzzle, depth):
+    """Return the states after <depth> moves, in depth-first order.
+
+    Each state is returned with whether it is solved. Solved states are
+    not extended, so they can be found after fewer moves.
+
+    @type puzzle: Puzzle
+    @type depth: int
+    @rtype: list[(Puzzle, bool)]
+
+    >>> w = WordLadderPuzzle('ye', 'ac')
+    >>> [str(state) for state, _ in _split(w, 1)][:2]
+    ['ye be', 'ye de']
+    """
+    level = [(puzzle, puzzle.is_solved())]
+    for _ in range(depth):
+        next_level = []
+        for state, solved in level:
+            if solved:
+                next_level.append((state, solved))
+            else:
+                next_level += [(child, child.is_solved())
+                               for child in state.extensions()]
+        level = next_level
+    return level
+
+
+def hint_by_depth(puzzle, n, table=None, stats=None, time_limit=None,
+                  node_limit=None, cancel=None):
     """Return a hint for the given puzzle state.
 
     Precondition: n >= 1.
@@ -131,9 +1096,40 @@ def hint_by_depth(puzzle, n):
     If <puzzle> cannot lead to a solution or
     other valid state within <n> moves,
     return the string ’No possible extensions!’
+    Otherwise return the move to a state leading to a solution within <n>
+    moves if there is one, or else to a state leading to a valid state
+    after <n> moves.
+
+    The search is iterative deepening: it looks for a solution within 1,
+    2, 4, ... moves, up to <n>, and the hint is the first move leading to
+    a solution within the first of these bounds that has one. So a
+    solution close by is found without searching <n> moves deep, and moves
+    which lead nowhere are dropped early; but the hint need not lead to
+    the nearest solution, since the bound doubles rather than grows by
+    one, to keep deep searches linear.
+
+    If a transposition <table> is given, the result of the search from
+    each state with a given number of moves left is stored in it, and
+    reused when the same state is met again with the same number of
+    moves left. The puzzle must implement 'key' for this. Keeping the
+    table between hints makes hints for the same or later states of a
+    game much faster.
+
+    If a SearchStats collector <stats> is given, the work done by the
+    search is recorded in it, as in 'solve'.
+
+    The budget <time_limit>, <node_limit> and <cancel> is used as in
+    'solve'. If the search runs out of budget, the 'partial' attribute of
+    the SearchInterrupted it raises is the hint towards a valid state found
+    so far, or None if there is none yet.
 
     @type puzzle: Puzzle
     @type n: int
+    @type table: TranspositionTable | None
+    @type stats: SearchStats | None
+    @type time_limit: float | None
+    @type node_limit: int | None
+    @type cancel: threading.Event | None
     @rtype: str
 
     >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A'], \
@@ -162,8 +1158,12 @@ def hint_by_depth(puzzle, n):
     >>> print(hint_by_depth(w, 1))
     No possible extensions!
     """
+    # record the work done if there is a collector
+    extensions, is_solved = _instruments(stats)
+    # keep to the budget if there is one
+    budget = _budget(time_limit, node_limit, cancel)
     # if the puzzle has been solved
-    if puzzle.is_solved():
+    if is_solved(puzzle):
         # return the message
         return "Already at a solution!"
 
@@ -177,45 +1177,120 @@ def hint_by_depth(puzzle, n):
         @rtype: int | None
         """
         # if the puzzle has been solved
-        if puz.is_solved():
+        if is_solved(puz):
             return 2
         # if the move is 0
         if m == 0:
             return 1
-        # define a result as none
-        result = None
-        # loop the list of all possible moves
-        for state in puz.extensions():
-            # recursively get the number of possible depth within m - 1 moves
-            x = helper(state, m - 1)
-            # if x exist
-            if x:
-                # if x is 2
-                if x == 2:
-                    return 2
-                # otherwise result is 1
-                result = 1
+        # if the result is already known
+        known = lookup(puz, m)
+        if known is not MISSING:
+            return known
+        # for each level of the current path: its state, the extensions
+        # still to try, the moves left, and the best result found so far
+        stack = [[puz, iter(extensions(puz, depth - m)), m, None]]
+        while stack:
+            frame = stack[-1]
+            # get the next extension to try at the deepest level
+            state = next(frame[1], None)
+            # if it is over the budget, give up
+            if budget is not None and state is not None:
+                budget.spend()
+            # if there are none left, go back up one level
+            if state is None:
+                stack.pop()
+                result = frame[3]
+                store(frame[0], frame[2], result)
+                # if it reached a valid state, so did its parent
+                if stack and result:
+                    stack[-1][3] = 1
+                continue
+            # the moves left after this one
+            moves = frame[2] - 1
+            # if the state is solved
+            if is_solved(state):
+                return found_solution(stack)
+            # if all moves are used, the state is valid
+            if moves == 0:
+                frame[3] = 1
+                continue
+            # if the result for the state is known, use it
+            known = lookup(state, moves)
+            if known == 2:
+                return found_solution(stack)
+            elif known is MISSING:
+                # otherwise try the extensions of the state
+                stack.append([state, iter(extensions(state, depth - moves)),
+                              moves, None])
+            elif known:
+                frame[3] = 1
         return result
-    # define a result as None
-    result = None
-    # loop the list of all possible moves
-    for state in puzzle.extensions():
-        # call the helper to get the number of possible depth within n-1 moves
-        x = helper(puzzle, n - 1)
-        # if x exist
-        if x:
-            # if x is 2
+
+    def found_solution(stack):
+        """Record that every state on the path leads to a solution.
+
+        @type stack: list[list]
+        @rtype: int
+        """
+        for frame in stack:
+            store(frame[0], frame[2], 2)
+        return 2
+
+    def lookup(puz, m):
+        """Return the stored result of helper(puz, m), or MISSING.
+
+        @type puz: Puzzle
+        @type m: int
+        @rtype: int | None | object
+        """
+        if table is None:
+            return MISSING
+        return table.get((puz.key(), m))
+
+    def store(puz, m, result):
+        """Store the result of helper(puz, m) if there is a table.
+
+        @type puz: Puzzle
+        @type m: int
+        @type result: int | None
+        @rtype: None
+        """
+        if table is not None:
+            table.put((puz.key(), m), result)
+
+    # the moves which can still lead somewhere, in the order of extensions
+    alive = extensions(puzzle, 0)
+    # search deeper and deeper, doubling the depth each time
+    depth = 0
+    while depth < n:
+        depth = min(2 * depth, n) or 1
+        # the moves which lead to a valid state within <depth> moves
+        survivors = []
+        # loop the moves still alive
+        for state in alive:
+            # call the helper to search the moves left after this one
+            try:
+                x = helper(state, depth - 1)
+            # if it ran out of budget, the progress is the hint found so far
+            except SearchInterrupted as e:
+                e.partial = puzzle.compare(alive[0]) if depth > 1 else None
+                raise
+            # if x is 2, the move leads to a solution
             if x == 2:
                 # compare the two states
                 return puzzle.compare(state)
-            # if the result does not exist
-            if not result:
-                # the result is current state
-                result = state
-    # if result exist
-    if result:
+            # if x exist, the move leads to a valid state
+            if x:
+                survivors.append(state)
+        # a move which cannot make <depth> moves cannot make more either
+        alive = survivors
+        # if no move is left
+        if not alive:
+            break
+    # if a move leads to a valid state within n moves
+    if alive:
         # compare the two puzzle
-        return puzzle.compare(result)
+        return puzzle.compare(alive[0])
     # otherwise return the erroe message
     return "No possible extensions!"
 
@@ -1,4 +1,4 @@
--# Assignment 2 - Puzzle Game
+# Assignment 2 - Puzzle Game
 #
 # CSC148 Summer 2017, University of Toronto
 # ---------------------------------------------
@@ -23,9 +23,13 @@ Here are the rules of Sudoku:
 Note that most, but not all, of the code is given to you already.
 """
 from puzzle import Puzzle
+from dancing_links import ExactCover
 from math import sqrt
 
 CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# The ways 'extensions' can choose the empty cell to fill in:
+# the first empty cell, or the most constrained one.
+BRANCHING = ('first', 'mrv')
 
 
 class SudokuPuzzle(Puzzle):
@@ -33,25 +37,80 @@ class SudokuPuzzle(Puzzle):
     # === Private Attributes ===
     # @type _n: int
     #     The size of the board. Must be 4, 9, 16, or 25.
-    # @type _grid: list[list[str]]
-    #     A representation of the Sudoku grid. Consists of a list of lists,
-    #     where each inner list represents a row of the grid.
+    # @type _grid: list[tuple[str]]
+    #     A representation of the Sudoku grid. Consists of a list of tuples,
+    #     where each tuple represents a row of the grid.
+    #
+    #     Rows are never changed once created, so a new state shares every
+    #     row with its parent except the one where the move was made.
     #
     #     Each item of the inner list is either an uppercase letter,
     #     or is the empty string '', representing an empty square.
     #     Each letter must be between 'A' and the n-th letter of the alphabet.
-
-    def __init__(self, grid):
+    # @type _rows: list[int]
+    #     The letters used in each row, as a bitmask: bit i is set
+    #     when the letter CHARS[i] is in the row.
+    # @type _cols: list[int]
+    #     The letters used in each column, as a bitmask.
+    # @type _boxes: list[int]
+    #     The letters used in each subsquare, as a bitmask. Subsquares
+    #     are numbered top-down, left-to-right.
+    # @type _branching: str
+    #     How 'extensions' chooses the cell to fill in. One of BRANCHING.
+    # @type _propagate: bool
+    #     Whether 'extensions' also fills in the cells forced by each move.
+    # @type _empty: int
+    #     The number of empty cells.
+    # @type _valid: bool
+    #     Whether every letter is one of the first n letters and appears
+    #     at most once in its row, column and subsquare. Together with
+    #     _empty, this makes 'is_solved' a constant time check; both are
+    #     updated by each move instead of rescanning the grid.
+    __slots__ = ('_n', '_grid', '_rows', '_cols', '_boxes', '_branching',
+                 '_propagate', '_empty', '_valid')
+
+    def __init__(self, grid, branching='first', propagate=False):
         """Create a new Sudoku puzzle with an initial grid 'grid'.
 
+        <branching> chooses the empty cell that 'extensions' fills in:
+        'first' for the first empty cell, or 'mrv' for the cell with the
+        fewest possible letters. If <propagate> is True, 'extensions'
+        also fills in every cell forced by the move (see 'propagate').
+        Every state reached from this puzzle uses the same choices.
+
         Precondition: <grid> is a valid Sudoku grid.
 
         @type self: SudokuPuzzle
         @type grid: list[list[str]]
+        @type branching: str
+        @type propagate: bool
         @rtype: None
         """
+        if branching not in BRANCHING:
+            raise ValueError('Unknown branching: {}'.format(branching))
+        self._branching = branching
+        self._propagate = propagate
         self._n = len(grid)
-        self._grid = grid
+        self._grid = [tuple(row) for row in grid]
+        # Record the letters already used in each row, column and subsquare
+        self._rows = [0] * self._n
+        self._cols = [0] * self._n
+        self._boxes = [0] * self._n
+        self._empty = 0
+        self._valid = True
+        for i in range(self._n):
+            for j in range(self._n):
+                if grid[i][j] == '':
+                    self._empty += 1
+                    continue
+                letter = CHARS.index(grid[i][j])
+                bit = 1 << letter
+                # The letter is out of range, or already used
+                if letter >= self._n or self._used(i, j) & bit:
+                    self._valid = False
+                self._rows[i] |= bit
+                self._cols[j] |= bit
+                self._boxes[self._box(i, j)] |= bit
 
     def __str__(self):
         """Return a human-readable string representation of <self>.
@@ -127,42 +186,24 @@ class SudokuPuzzle(Puzzle):
                               ['D', 'C', 'B', 'A']])
         >>> s.is_solved()
         False
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', 'D', 'C'], \
+                              ['D', 'C', 'B', '']])
+        >>> s.is_solved(), s.move('(3, 3) -> A').is_solved()
+        (False, True)
         """
-        # Check for empty cells
-        for row in self._grid:
-            if '' in row:
-                return False
-
-        # Check rows
-        for row in self._grid:
-            if sorted(row) != list(CHARS[:self._n]):
-                return False
-
-        # Check cols
-        for i in range(self._n):
-            # Note the use of a list comprehension here.
-            if sorted([row[i] for row in self._grid]) != list(CHARS[:self._n]):
-                return False
-
-        # Check all subsquares
-        m = int(sqrt(self._n))
-        for x in range(0, self._n, m):
-            for y in range(0, self._n, m):
-                items = [self._grid[x + i][y + j]
-                         for i in range(m)
-                         for j in range(m)]
-
-                if sorted(items) != list(CHARS[:self._n]):
-                    return False
-
-        # All checks passed
-        return True
+        # The grid is checked when the puzzle is created, and kept up to
+        # date by every move
+        return self._empty == 0 and self._valid
 
     def extensions(self):
         """Return list of extensions of <self>.
 
         This method picks the first empty cell (looking top-down,
-        left-to-right) and returns a list of the new puzzle states
+        left-to-right), or the most constrained empty cell if <self>
+        was created with branching 'mrv' (see _most_constrained_cell),
+        and returns a list of the new puzzle states
         obtained by filling in the empty cell with one of the
         available letters that does not violate any of the constraints
         listed in the problem description. (E.g., if there is
@@ -171,6 +212,11 @@ class SudokuPuzzle(Puzzle):
 
         If there are no empty cells, returns an empty list.
 
+        If <self> was created with propagate set, each new state also
+        has its forced cells filled in, and states where propagation
+        finds a contradiction are left out. Such a state can then differ
+        from <self> in more than one cell.
+
         @type self: SudokuPuzzle
         @rtype: list[SudokuPuzzle]
 
@@ -190,22 +236,157 @@ class SudokuPuzzle(Puzzle):
         2|BA|D
         3|DC|
         <BLANKLINE>
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['', '', '', ''], \
+                              ['', '', 'A', ''], \
+                              ['', '', '', '']], 'mrv')
+        >>> print(s.extensions()[0])
+          01|23
+         ------
+        0|AB|CD
+        1|  |B
+         ------
+        2|  |A
+        3|  |
+        <BLANKLINE>
         """
-        # Search for the first empty cell
-        row_index, col_index = None, None
-        for i in range(self._n):
-            row = self._grid[i]
-            if '' in row:
-                row_index, col_index = i, row.index('')
-                break
+        if self._branching == 'mrv':
+            row_index, col_index = self._most_constrained_cell()
+        else:
+            row_index, col_index = self._first_empty_cell()
 
         if row_index is None:
             return []
         else:
             # Calculate possible letter to fill the empty cell
             letters = self._possible_letters(row_index, col_index)
-            return [self._extend(letter, row_index, col_index)
-                    for letter in letters]
+            states = [self._extend(letter, row_index, col_index)
+                      for letter in letters]
+            if self._propagate:
+                states = [state.propagate() for state in states]
+                return [state for state in states if state is not None]
+            return states
+
+    def propagate(self):
+        """Return <self> with all the cells forced by its letters filled in.
+
+        Repeatedly fill in
+            - naked singles: empty cells with only one possible letter, and
+            - hidden singles: letters which fit in only one empty cell of
+              a row, column or subsquare,
+        until neither is left. Return None if this shows that <self>
+        cannot be solved: an empty cell has no possible letters, or a
+        letter fits nowhere in a row, column or subsquare.
+
+        Return <self> itself if there is nothing to fill in.
+
+        @type self: SudokuPuzzle
+        @rtype: SudokuPuzzle | None
+
+        >>> s = SudokuPuzzle([['A', 'B', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', 'A', 'C']])
+        >>> print(s.propagate())
+          01|23
+         ------
+        0|AB|CD
+        1|DC|BA
+         ------
+        2|CA|DB
+        3|BD|AC
+        <BLANKLINE>
+        >>> s = SudokuPuzzle([['A', 'B', '', ''], \
+                              ['', '', 'C', ''], \
+                              ['', '', '', 'C'], \
+                              ['', '', '', '']])
+        >>> print(s.propagate())
+        None
+        """
+        grid = [list(row) for row in self._grid]
+        rows, cols, boxes = self._rows.copy(), self._cols.copy(), \
+            self._boxes.copy()
+        full = (1 << self._n) - 1
+        changed_rows = set()
+        filled = []
+
+        def place(i, j, bit):
+            """Fill in cell (i, j) with the letter of <bit>.
+
+            Return False if the letter is already used in the row, column
+            or subsquare.
+
+            @type i: int
+            @type j: int
+            @type bit: int
+            @rtype: bool
+            """
+            b = self._box(i, j)
+            if (rows[i] | cols[j] | boxes[b]) & bit:
+                return False
+            grid[i][j] = CHARS[bit.bit_length() - 1]
+            rows[i] |= bit
+            cols[j] |= bit
+            boxes[b] |= bit
+            changed_rows.add(i)
+            filled.append((i, j))
+            return True
+
+        changed = True
+        while changed:
+            changed = False
+            # Naked singles
+            for i in range(self._n):
+                for j in range(self._n):
+                    if grid[i][j] == '':
+                        bits = full & ~(rows[i] | cols[j] |
+                                        boxes[self._box(i, j)])
+                        if bits == 0:
+                            return None
+                        if bits & (bits - 1) == 0:
+                            place(i, j, bits)
+                            changed = True
+            # Hidden singles
+            for unit in _units(self._n):
+                # The letters possible in at least one / more than one cell
+                once, more = 0, 0
+                cells = []
+                for i, j in unit:
+                    if grid[i][j] == '':
+                        bits = full & ~(rows[i] | cols[j] |
+                                        boxes[self._box(i, j)])
+                        more |= once & bits
+                        once |= bits
+                        cells.append((i, j, bits))
+                used = 0
+                for i, j in unit:
+                    if grid[i][j] != '':
+                        used |= 1 << CHARS.index(grid[i][j])
+                if full & ~used & ~once:
+                    return None
+                singles = once & ~more
+                for i, j, bits in cells:
+                    bit = bits & singles
+                    if bit:
+                        # Two letters which both fit only in this cell
+                        if bit & (bit - 1) or not place(i, j, bit):
+                            return None
+                        changed = True
+
+        if not changed_rows:
+            return self
+        puzzle = SudokuPuzzle.__new__(SudokuPuzzle)
+        puzzle._branching = self._branching
+        puzzle._propagate = self._propagate
+        puzzle._n = self._n
+        # Share the rows which did not change
+        puzzle._grid = [tuple(grid[i]) if i in changed_rows else
+                        self._grid[i] for i in range(self._n)]
+        puzzle._rows, puzzle._cols, puzzle._boxes = rows, cols, boxes
+        # Only letters which fit were placed
+        puzzle._empty = self._empty - len(filled)
+        puzzle._valid = self._valid
+        return puzzle
 
     def move(self, move):
         """Return a new puzzle state specified by making the given move.
@@ -293,34 +474,37 @@ class SudokuPuzzle(Puzzle):
             raise ValueError('Index out of range!')
         # get the letter by th row and column index in the move string
         letter = parts[1].strip()
-        # if the letter is not in the alphabet
-        if letter not in CHARS:
+        # if the letter is not one of the letters of this board
+        if len(letter) != 1 or letter not in CHARS[:self._n]:
             # raise the value error
             raise ValueError('Unrecognized letter!')
         # if the cell is not empty string by the row index and column index
         if self._grid[row_index][col_index] != '':
             # raise the value error
             raise ValueError('Non-empty cell found!')
-        # if the letter in the each row with the matched column index
-        if letter in set(self._grid[x][col_index] for x in range(self._n)):
+        # if the letter is already used in the row, column or subsquare
+        if self._used(row_index, col_index) & (1 << CHARS.index(letter)):
             # raise the value error
             raise ValueError('Repetitive letter found!')
-        # if the letter in the each row with the matched column index
-        if letter in set(self._grid[row_index][y] for y in range(self._n)):
-            raise ValueError('Repetitive letter found!')
-        # get the subsquare with the length of grid
-        m = int(sqrt(self._n))
-        # get the base of x
-        base_x = row_index // m * m
-        # get the base of y
-        base_y = col_index // m * m
-        # check the whether there exists repetitive letter
-        if letter in set(self._grid[base_x + dx][base_y + dy]
-                         for dx in range(m) for dy in range(m)):
-            raise ValueError('Repetitive letter found!')
         # return the obtained puzzle after the given moves
         return self._extend(letter, row_index, col_index)
 
+    def key(self):
+        """Return a hashable value identifying this puzzle state.
+
+        This is the grid, as a tuple of rows.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple[tuple[str]]
+
+        >>> s = SudokuPuzzle([['A', ''], ['', '']])
+        >>> s.key()
+        (('A', ''), ('', ''))
+        >>> s == SudokuPuzzle([['A', ''], ['', '']])
+        True
+        """
+        return tuple(self._grid)
+
     def compare(self, state):
         """Return a move obtained by comparing with <state>
         or None if no differences found
@@ -352,6 +536,217 @@ class SudokuPuzzle(Puzzle):
                     return '({}, {}) -> {}'.format(
                         row, col, state._grid[row][col])
 
+    def to_data(self):
+        """Return the grid of <self>, as lists of rows, for JSON.
+
+        Empty cells are empty strings.
+
+        @type self: SudokuPuzzle
+        @rtype: dict[str, list[list[str]]]
+
+        >>> SudokuPuzzle([['A', ''], ['', '']]).to_data()
+        {'grid': [['A', ''], ['', '']]}
+        """
+        return {'grid': [list(row) for row in self._grid]}
+
+    def heuristic(self):
+        """Return the number of cells still to fill in.
+
+        Every empty cell needs its own move, so this is never more than
+        the cost of a solution. Return float('inf') if a letter clashes
+        with another or an empty cell has no possible letters, since
+        <self> then leads to no solution.
+
+        @type self: SudokuPuzzle
+        @rtype: float
+
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', '', ''], \
+                              ['D', 'C', '', '']])
+        >>> s.heuristic()
+        4
+        >>> s = SudokuPuzzle([['', 'B', 'C', ''], \
+                              ['', 'A', '', ''], \
+                              ['D', '', '', ''], \
+                              ['', '', '', '']])
+        >>> s.heuristic()
+        inf
+        """
+        if not self._valid:
+            return float('inf')
+        full = (1 << self._n) - 1
+        for i in range(self._n):
+            row = self._grid[i]
+            for j in range(self._n):
+                if row[j] == '' and self._used(i, j) == full:
+                    return float('inf')
+        return self._empty
+
+    def cost(self, state):
+        """Return the number of cells filled in by the move to <state>.
+
+        This is 1 unless <self> was created with propagate set, in which
+        case one extension can fill in several cells.
+
+        @type self: SudokuPuzzle
+        @type state: SudokuPuzzle
+        @rtype: int
+        """
+        return self._empty - state._empty
+
+    def direct_solve(self, spend=None):
+        """Return a solution of <self> found as an exact cover problem.
+
+        Return None if there are no possible solutions.
+        See dancing_links.py. <spend> is called before each partial grid
+        is explored, and may raise an exception to stop the search.
+
+        @type self: SudokuPuzzle
+        @type spend: function | None
+        @rtype: SudokuPuzzle | None
+
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', '', ''], \
+                              ['D', 'C', '', '']])
+        >>> print(s.direct_solve())
+          01|23
+         ------
+        0|AB|CD
+        1|CD|AB
+         ------
+        2|BA|DC
+        3|DC|BA
+        <BLANKLINE>
+        """
+        for solution in self._exact_cover_solutions(1, spend=spend):
+            return solution
+        return None
+
+    def direct_solve_complete(self):
+        """Return all solutions of <self> found as an exact cover problem.
+
+        The solutions are in the same order as those of
+        solver.solve_complete: sorted by their cells, read top-down,
+        left-to-right.
+
+        @type self: SudokuPuzzle
+        @rtype: list[SudokuPuzzle]
+
+        >>> s = SudokuPuzzle([['A', 'B', '', ''], \
+                              ['C', 'D', '', ''], \
+                              ['B', '', '', ''], \
+                              ['D', '', 'A', '']])
+        >>> for x in s.direct_solve_complete():
+        ...     print(x)
+          01|23
+         ------
+        0|AB|CD
+        1|CD|BA
+         ------
+        2|BA|DC
+        3|DC|AB
+        <BLANKLINE>
+          01|23
+         ------
+        0|AB|DC
+        1|CD|BA
+         ------
+        2|BA|CD
+        3|DC|AB
+        <BLANKLINE>
+        """
+        return sorted(self._exact_cover_solutions(),
+                      key=lambda puzzle: puzzle._grid)
+
+    def direct_iter_solutions(self, spend=None):
+        """Yield the solutions of <self> found as an exact cover problem,
+        each as soon as it is found.
+
+        The solutions are in the same order as those of
+        direct_solve_complete: the search fills in the first empty cell
+        with each letter in turn, except for the cells and letters which
+        have only one option left. <spend> is called before each partial
+        grid is explored, and may raise an exception to stop the search.
+
+        @type self: SudokuPuzzle
+        @type spend: function | None
+        @rtype: iterator[SudokuPuzzle]
+
+        >>> s = SudokuPuzzle([[''] * 4 for _ in range(4)])
+        >>> solutions = s.direct_iter_solutions()
+        >>> next(solutions).to_data()['grid'][0]
+        ['A', 'B', 'C', 'D']
+        """
+        return self._exact_cover_solutions(ordered=True, spend=spend)
+
+    def count_solutions(self, limit=None):
+        """Return the number of solutions of <self>.
+
+        Stop counting at <limit> if it is not None; e.g. a limit of 2 is
+        enough to tell whether a puzzle has a unique solution.
+
+        @type self: SudokuPuzzle
+        @type limit: int | None
+        @rtype: int
+
+        >>> s = SudokuPuzzle([['', '', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', '', '']])
+        >>> s.count_solutions()
+        288
+        >>> s.count_solutions(2)
+        2
+        """
+        return sum(1 for _ in self._exact_cover_solutions(limit))
+
+    # ------------------------------------------------------------------------
+    # Helpers for exact cover
+    # ------------------------------------------------------------------------
+    def _exact_cover_solutions(self, limit=None, ordered=False, spend=None):
+        """Yield the solutions of <self>, solved as an exact cover problem.
+
+        There is a column for each cell, and for each letter in each row,
+        column and subsquare. Filling in a cell covers four columns.
+        Letters already in the grid are the only option for their cell,
+        so an invalid grid has no solutions. The columns of the cells
+        come first, top-down, left-to-right, and the options of each cell
+        are in alphabetical order, so that with <ordered> the solutions
+        are sorted by their cells. <limit>, <ordered> and <spend> are
+        passed on to ExactCover.solutions.
+
+        @type self: SudokuPuzzle
+        @type limit: int | None
+        @type ordered: bool
+        @type spend: function | None
+        @rtype: iterator[SudokuPuzzle]
+        """
+        n = self._n
+        options = []
+        rows = []
+        for i in range(n):
+            for j in range(n):
+                if self._grid[i][j] != '':
+                    letters = [CHARS.index(self._grid[i][j])]
+                else:
+                    used = self._used(i, j)
+                    letters = [k for k in range(n) if not used >> k & 1]
+                b = self._box(i, j)
+                for k in letters:
+                    options.append((i, j, CHARS[k]))
+                    rows.append([i * n + j, n * n + i * n + k,
+                                 2 * n * n + j * n + k,
+                                 3 * n * n + b * n + k])
+        problem = ExactCover(4 * n * n, rows)
+        for solution in problem.solutions(limit, ordered, spend):
+            grid = [[''] * n for _ in range(n)]
+            for option in solution:
+                i, j, letter = options[option]
+                grid[i][j] = letter
+            yield SudokuPuzzle(grid, self._branching, self._propagate)
+
     # ------------------------------------------------------------------------
     # Helpers for method 'extensions'
     # ------------------------------------------------------------------------
@@ -379,28 +774,120 @@ class SudokuPuzzle(Puzzle):
         >>> s._possible_letters(3,3)
         ['A']
         """
-        # TODO: Change this method to only return valid moves.
-
-        # create a set including the characters based on the board
-        result = set(CHARS[:self._n])
-        # loop the board, and find the letter in the each row with matched
-        # column index
-        result -= set(self._grid[x][col_index] for x in range(0, self._n))
-        # loop the board, and find the letter in the each column with matched
-        # row index
-        result -= set(self._grid[row_index][y] for y in range(0, self._n))
-        # get the subsquare with the length of grid
+        # get the letters used in the row, column and subsquare
+        used = self._used(row_index, col_index)
+        # return the letters of the board which are not used, in order
+        return [CHARS[i] for i in range(self._n) if not used >> i & 1]
+
+    def _first_empty_cell(self):
+        """Return the first empty cell, looking top-down, left-to-right.
+
+        Return (None, None) if there are no empty cells.
+
+        @type self: SudokuPuzzle
+        @rtype: (int | None, int | None)
+        """
+        for i in range(self._n):
+            row = self._grid[i]
+            if '' in row:
+                return i, row.index('')
+        return None, None
+
+    def _most_constrained_cell(self):
+        """Return the empty cell with the fewest possible letters.
+
+        Ties are broken by the number of other empty cells in the same
+        row, column or subsquare: the cell constraining the most other
+        cells is returned. Remaining ties go to the first cell, looking
+        top-down, left-to-right.
+
+        Return (None, None) if there are no empty cells.
+
+        @type self: SudokuPuzzle
+        @rtype: (int | None, int | None)
+
+        >>> s = SudokuPuzzle([['A', 'B', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', '', ''], \
+                              ['', '', '', 'C']])
+        >>> s._most_constrained_cell()
+        (0, 3)
+        """
+        best, best_count, ties = (None, None), self._n + 1, []
+        for i in range(self._n):
+            row = self._grid[i]
+            for j in range(self._n):
+                if row[j] == '':
+                    count = self._n - bin(self._used(i, j)).count('1')
+                    if count < best_count:
+                        best, best_count, ties = (i, j), count, [(i, j)]
+                        # A cell with no possible letters is a dead end
+                        if count == 0:
+                            return best
+                    elif count == best_count:
+                        ties.append((i, j))
+        if len(ties) > 1:
+            # max returns the first of the cells with the highest degree
+            best = max(ties, key=lambda cell: self._degree(*cell))
+        return best
+
+    def _degree(self, row_index, col_index):
+        """Return the number of other empty cells sharing a row, column
+        or subsquare with a cell.
+
+        @type self: SudokuPuzzle
+        @type row_index: int
+        @type col_index: int
+        @rtype: int
+        """
         m = int(sqrt(self._n))
-        # get the base x
         base_x = row_index // m * m
-        # get the base y
         base_y = col_index // m * m
-        # get the all possible letters which are the subset of the available
-        # letters
-        result -= set(self._grid[base_x + dx][base_y + dy]
-                      for dx in range(m) for dy in range(m))
-        # sort the list of result and return
-        return sorted(list(result))
+        peers = set((row_index, y) for y in range(self._n))
+        peers |= set((x, col_index) for x in range(self._n))
+        peers |= set((base_x + dx, base_y + dy)
+                     for dx in range(m) for dy in range(m))
+        peers.discard((row_index, col_index))
+        return sum(1 for x, y in peers if self._grid[x][y] == '')
+
+    def _used(self, row_index, col_index):
+        """Return the bitmask of the letters which cannot go in a cell.
+
+        These are the letters already used in the row, column or
+        subsquare of the cell.
+
+        @type self: SudokuPuzzle
+        @type row_index: int
+        @type col_index: int
+        @rtype: int
+
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', '', ''], \
+                              ['D', 'C', '', '']])
+        >>> bin(s._used(2, 2))
+        '0b111'
+        """
+        return (self._rows[row_index] | self._cols[col_index] |
+                self._boxes[self._box(row_index, col_index)])
+
+    def _box(self, row_index, col_index):
+        """Return the number of the subsquare containing a cell.
+
+        @type self: SudokuPuzzle
+        @type row_index: int
+        @type col_index: int
+        @rtype: int
+
+        >>> s = SudokuPuzzle([['A', 'B', 'C', 'D'], \
+                              ['C', 'D', 'A', 'B'], \
+                              ['B', 'A', '', ''], \
+                              ['D', 'C', '', '']])
+        >>> s._box(2, 3)
+        3
+        """
+        m = int(sqrt(self._n))
+        return row_index // m * m + col_index // m
 
     def _extend(self, letter, row_index, col_index):
         """Return a new Sudoku puzzle obtained after one move.
@@ -432,9 +919,56 @@ class SudokuPuzzle(Puzzle):
         3|DC|
         <BLANKLINE>
         """
-        new_grid = [row.copy() for row in self._grid]
-        new_grid[row_index][col_index] = letter
-        return SudokuPuzzle(new_grid)
+        # Share all rows with <self> except the one which changes
+        row = self._grid[row_index]
+        new_grid = self._grid.copy()
+        new_grid[row_index] = row[:col_index] + (letter,) + row[col_index + 1:]
+        # Copy the bitmasks and add the letter, instead of rescanning
+        # the grid in the constructor
+        bit = 1 << CHARS.index(letter)
+        used = self._used(row_index, col_index)
+        puzzle = SudokuPuzzle.__new__(SudokuPuzzle)
+        puzzle._branching = self._branching
+        puzzle._propagate = self._propagate
+        puzzle._n = self._n
+        puzzle._grid = new_grid
+        puzzle._rows = self._rows.copy()
+        puzzle._rows[row_index] |= bit
+        puzzle._cols = self._cols.copy()
+        puzzle._cols[col_index] |= bit
+        puzzle._boxes = self._boxes.copy()
+        puzzle._boxes[self._box(row_index, col_index)] |= bit
+        # One cell fewer is empty, and the letter may clash with another
+        puzzle._empty = self._empty - 1
+        puzzle._valid = self._valid and not used & bit
+        return puzzle
+
+
+def _units(n):
+    """Return the rows, columns and subsquares of an n-by-n board.
+
+    Each is a list of the (row, column) positions of its cells.
+
+    @type n: int
+    @rtype: list[list[(int, int)]]
+
+    >>> len(_units(4))
+    12
+    >>> _units(4)[-1]
+    [(2, 2), (2, 3), (3, 2), (3, 3)]
+    """
+    if n not in _UNITS:
+        m = int(sqrt(n))
+        units = [[(i, j) for j in range(n)] for i in range(n)]
+        units += [[(i, j) for i in range(n)] for j in range(n)]
+        units += [[(x + dx, y + dy) for dx in range(m) for dy in range(m)]
+                  for x in range(0, n, m) for y in range(0, n, m)]
+        _UNITS[n] = units
+    return _UNITS[n]
+
+
+# The units of each board size, computed by _units when first needed
+_UNITS = {}
 
 
 if __name__ == '__main__':
@@ -14,8 +14,20 @@ particular puzzle, either.
 You should *not* change this file.
 """
 # Extra imports to run a web-based view
+import gzip
+import hashlib
 import http.server
+import json
+import os
 import socketserver
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from http.cookies import SimpleCookie, CookieError
 from urllib.parse import parse_qs, urlparse
 
 
@@ -69,9 +81,12 @@ class TextView(View):
         while True:
             print('Enter a command:')
             user_input = input('> ')
-            msg, should_quit = self._controller.act(user_input.strip())
-            print(msg)
-            if should_quit:
+            chunks, should_quit = self._controller.act_stream(
+                user_input.strip())
+            # Print each piece of the message as soon as it is ready
+            for chunk in chunks:
+                print(chunk)
+            if should_quit():
                 break
         print(self._goodbye)
 
@@ -79,6 +94,24 @@ class TextView(View):
 # ----------------------------------------------------------------------------
 # Web view. You are *NOT* responsible for understanding this code.
 # ----------------------------------------------------------------------------
+# The most games a web view keeps; the least recently used is dropped
+MAX_SESSIONS = 1000
+# The name of the cookie holding the session id of a browser
+SESSION_COOKIE = 'session'
+# The most solve jobs a game keeps; the oldest is cancelled and dropped
+MAX_JOBS = 16
+# The most seconds between two progress events of a job's event stream
+EVENT_INTERVAL = 0.5
+# Responses of at least this many bytes are compressed, if the browser
+# accepts gzip
+GZIP_MIN_SIZE = 1024
+# The largest request body, in bytes, the JSON action API reads
+MAX_BODY = 1 << 20
+# The paths which start a game for a browser which has none; any other
+# path only looks up the browser's game
+SESSION_PATHS = ('/', '/game.html', '/actions', '/api/actions', '/jobs/new')
+
+
 class WebView(View):
     """Web implementation of a game view.
 
@@ -93,52 +126,750 @@ class WebView(View):
     You aren't responsible for understanding this code, but you might have
     some fun looking into how to modify the file 'game.html' to make the
     webpage look more attractive.
+
+    Each request is handled on its own thread, and connections are kept
+    alive between requests; HTTP/1.0 clients, which cannot read chunked
+    responses, get whole responses and their connection is closed. Every
+    browser plays its own game: it gets a session id in a cookie, and its
+    actions go to a controller of its own (see Controller.new_game). Only
+    the paths in SESSION_PATHS start a game; other requests, such as
+    the browser's request for a favicon, never do. The searches of
+    ':SOLVE' and ':HINT' run on a pool of worker processes shared by all
+    games, so they neither block other games nor compete with them for
+    one core. ':SOLVE-ALL' streams each solution as it is found, so it
+    runs on the thread of its request, for at most the time limit; use
+    a job to run it in the background instead. ':STATS' only reports
+    the last search, so it does not need the pool.
+
+    Long solves can also run as jobs in the background
+    (see Controller.start_job), so that no request waits for them:
+        - /jobs/new?action=:SOLVE-ALL starts one and returns its id,
+        - /jobs/<id>?since=k returns its progress, with the solutions
+          after the first k,
+        - /jobs/<id>/events streams its solutions and progress as
+          Server-Sent Events until it ends,
+        - /jobs/<id>/cancel cancels it.
+    Each of these returns JSON, except for the event stream.
+
+    Programs can play through a JSON action API instead of the HTML log
+    (see Controller.act_data):
+        - GET /api/actions?action=<action> runs one action,
+        - POST /api/actions with a body {"actions": [<action>, ...]}
+          runs the actions in order, with one request for the batch.
+    Both return {"results": [...], "done": <bool>}, with one result per
+    action run: its message, whether the game should end, whether the
+    current state is solved, and the current state. Actions after the
+    one which ends the game are not run.
+
+    Static files such as game.html are read once and kept in memory with
+    their gzipped form; they are only read again when they change on
+    disk. Browsers revalidate them with ETag or Last-Modified and get
+    an empty "304 Not Modified" when they are up to date. Action
+    responses of GZIP_MIN_SIZE bytes or more are gzipped as they stream.
     """
-    def __init__(self, controller):
+    # === Private attributes ===
+    # @type _port: int
+    #     The port to serve on
+    # @type _workers: int | None
+    #     The number of worker processes, or None for one per core
+    # @type _sessions: OrderedDict[str, _Session]
+    #     The games being played, from least to most recently used
+    # @type _lock: threading.Lock
+    #     Held while _sessions is used
+    # @type _executor: concurrent.futures.Executor | None
+    #     The worker pool, while the server runs
+    # @type _assets: dict[str, _Asset]
+    #     The static files read so far, by path
+
+    def __init__(self, controller, port=8000, workers=None):
         View.__init__(self, controller)
+        self._port = port
+        self._workers = workers
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._assets = {}
 
-    def run(self):
-        """Start the game with a web view."""
+    def asset(self, path):
+        """Return the static file <path>, reading it only if it is not
+        in memory yet or has changed on disk since.
+
+        @type self: WebView
+        @type path: str
+        @rtype: _Asset
+        """
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is None or asset.mtime != mtime:
+                with open(path, 'rb') as f:
+                    asset = _Asset(f.read(), mtime)
+                self._assets[path] = asset
+            return asset
+
+    def session(self, cookie, create=True):
+        """Return the game of the browser which sent the Cookie header
+        <cookie>, and whether it is a new game.
+
+        A browser with no session id, or one which is no longer known,
+        starts a new game if <create> is True, and has no game (None)
+        otherwise.
+
+        @type self: WebView
+        @type cookie: str | None
+        @type create: bool
+        @rtype: (_Session | None, bool)
+        """
+        cookies = SimpleCookie()
+        if cookie:
+            try:
+                cookies.load(cookie)
+            except CookieError:
+                pass
+        morsel = cookies.get(SESSION_COOKIE)
+        with self._lock:
+            if morsel is not None and morsel.value in self._sessions:
+                self._sessions.move_to_end(morsel.value)
+                return self._sessions[morsel.value], False
+            if not create:
+                return None, False
+            session = _Session(uuid.uuid4().hex,
+                               self._controller.new_game(self._executor))
+            self._sessions[session.id] = session
+            if len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+            return session, True
+
+    def server(self):
+        """Return a server for this view on its port, not serving yet.
+
+        Port 0 picks a free port; the server's server_address has the
+        one picked. The searches run in the thread of their request until
+        'run' sets up the worker pool.
+
+        @type self: WebView
+        @rtype: http.server.HTTPServer
+        """
         thisview = self
 
         class GameRequestHandler(http.server.BaseHTTPRequestHandler):
             """Implementation of basic HTTP request handler for game view.
 
             This exists as an inner class because I wanted to reference self
-            in a method here, but had to pass in the class to TCPServer below.
+            in a method here, but had to pass in the class to the server
+            below.
             """
-            done = False
+            # Keep connections alive between requests
+            protocol_version = 'HTTP/1.1'
 
             def do_GET(self):
                 """Overridden method for handling GET requests."""
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                if 'actions' in self.path:
-                    query_params = parse_qs(urlparse(self.path).query)
+                url = urlparse(self.path)
+                session, new = thisview.session(self.headers.get('Cookie'),
+                                                url.path in SESSION_PATHS)
+                if url.path.startswith('/jobs/'):
+                    self.handle_job(session, new, url.path.split('/')[2:],
+                                    parse_qs(url.query))
+                elif url.path == '/api/actions':
+                    action = parse_qs(url.query).get('action', [''])[0]
+                    self.send_json(session, new, session.act_batch([action]))
+                elif url.path == '/actions':
+                    query_params = parse_qs(url.query)
+                    action = query_params.get('action', [''])[0]
+                    self.send_pieces(session, new, 'text/html',
+                                     _html_pieces(session.act_stream(action)))
+                elif url.path in ('/', '/game.html'):
+                    self.send_asset(session, new, 'game.html', 'text/html')
+                else:
+                    self.send_json(session, new, {'error': 'Not found!'},
+                                   404)
+
+            def do_POST(self):
+                """Overridden method for handling POST requests."""
+                path = urlparse(self.path).path
+                session, new = thisview.session(self.headers.get('Cookie'),
+                                                path == '/api/actions')
+                if path != '/api/actions':
+                    self.close_connection = True
+                    self.send_json(session, new, {'error': 'Not found!'},
+                                   404)
+                    return
+                try:
+                    actions = self.read_actions()
+                except ValueError as e:
+                    self.send_json(session, new, {'error': str(e)}, 400)
+                    return
+                if actions is None:
+                    self.send_json(session, new,
+                                   {'error': 'Request body is too large!'},
+                                   413)
+                    return
+                self.send_json(session, new, session.act_batch(actions))
+
+            def read_actions(self):
+                """Read the body of a POST to /api/actions, and return the
+                actions in it, or None if it is longer than MAX_BODY.
+
+                The body is a JSON object {"actions": [<action>, ...]}.
+                Raise a ValueError if it is not.
+
+                @type self: GameRequestHandler
+                @rtype: list[str] | None
+                """
+                try:
+                    length = int(self.headers.get('Content-Length', ''))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The end of the body is unknown, so is the next request
+                    self.close_connection = True
+                    raise ValueError('A valid Content-Length is required!')
+                if length > MAX_BODY:
+                    self.close_connection = True
+                    return None
+                try:
+                    data = json.loads(str(self.rfile.read(length), 'UTF-8'))
+                except UnicodeDecodeError:
+                    raise ValueError('Request body is not UTF-8!')
+                if not isinstance(data, dict):
+                    raise ValueError('Request body is not a JSON object!')
+                actions = data.get('actions')
+                if not (isinstance(actions, list) and
+                        all(isinstance(action, str) for action in actions)):
+                    raise ValueError('"actions" must be a list of strings!')
+                return actions
+
+            def send_asset(self, session, new, path, content_type):
+                """Send the static file <path>, or "304 Not Modified" if
+                the browser's copy is up to date.
+
+                @type self: GameRequestHandler
+                @type session: _Session
+                @type new: bool
+                @type path: str
+                @type content_type: str
+                @rtype: None
+                """
+                asset = thisview.asset(path)
+                headers = [('ETag', asset.etag),
+                           ('Last-Modified', asset.last_modified),
+                           ('Cache-Control', 'no-cache'),
+                           ('Vary', 'Accept-Encoding')]
+                if asset.matches(self.headers.get('If-None-Match'),
+                                 self.headers.get('If-Modified-Since')):
+                    self.start_response(session, new, content_type, headers,
+                                        304)
+                    return
+                body = asset.body
+                if self.accepts_gzip() and len(body) >= GZIP_MIN_SIZE:
+                    body = asset.gzipped
+                    headers.append(('Content-Encoding', 'gzip'))
+                headers.append(('Content-Length', len(body)))
+                self.start_response(session, new, content_type, headers)
+                self.wfile.write(body)
+
+            def send_pieces(self, session, new, content_type, pieces,
+                            status=200):
+                """Send the response made of the bytes of <pieces>,
+                each as soon as it is ready.
+
+                A response shorter than GZIP_MIN_SIZE is sent in one go.
+                A longer one is sent in chunks, since its length is
+                unknown until the last piece, and gzipped if the browser
+                accepts it. Each piece is flushed through the compressor,
+                so that it still reaches the browser right away. An
+                HTTP/1.0 client cannot read chunks, so it gets the whole
+                response at the end instead.
+
+                @type self: GameRequestHandler
+                @type session: _Session | None
+                @type new: bool
+                @type content_type: str
+                @type pieces: iterator[bytes]
+                @type status: int
+                @rtype: None
+                """
+                # HTTP/1.0 has no chunks: send the response in one go
+                if not self.can_chunk():
+                    self.send_body(session, new, content_type,
+                                   b''.join(pieces), status)
+                    return
+                # Wait for enough of the response to decide
+                head = []
+                size = 0
+                for piece in pieces:
+                    head.append(piece)
+                    size += len(piece)
+                    if size >= GZIP_MIN_SIZE:
+                        break
+                else:
+                    self.send_body(session, new, content_type,
+                                   b''.join(head), status)
+                    return
+                headers = [('Transfer-Encoding', 'chunked'),
+                           ('Vary', 'Accept-Encoding')]
+                compressor = None
+                if self.accepts_gzip():
+                    headers.append(('Content-Encoding', 'gzip'))
+                    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+                self.start_response(session, new, content_type, headers,
+                                    status)
+                for piece in chain(head, pieces):
+                    if compressor is not None:
+                        piece = (compressor.compress(piece) +
+                                 compressor.flush(zlib.Z_SYNC_FLUSH))
+                    # An empty chunk would end the response
+                    if piece:
+                        self.write_chunk(piece)
+                if compressor is not None:
+                    self.write_chunk(compressor.flush())
+                self.write_chunk(b'')
+
+            def send_body(self, session, new, content_type, body,
+                          status=200):
+                """Send the response <body> in one go, gzipped if it is
+                at least GZIP_MIN_SIZE bytes and the browser accepts it.
+
+                @type self: GameRequestHandler
+                @type session: _Session | None
+                @type new: bool
+                @type content_type: str
+                @type body: bytes
+                @type status: int
+                @rtype: None
+                """
+                headers = []
+                if len(body) >= GZIP_MIN_SIZE:
+                    headers.append(('Vary', 'Accept-Encoding'))
+                    if self.accepts_gzip():
+                        body = gzip.compress(body)
+                        headers.append(('Content-Encoding', 'gzip'))
+                headers.append(('Content-Length', len(body)))
+                self.start_response(session, new, content_type, headers,
+                                    status)
+                self.wfile.write(body)
+
+            def can_chunk(self):
+                """Return whether the client can read a chunked response.
+
+                @type self: GameRequestHandler
+                @rtype: bool
+                """
+                return self.request_version != 'HTTP/1.0'
+
+            def accepts_gzip(self):
+                """Return whether the browser accepts gzipped responses.
+
+                @type self: GameRequestHandler
+                @rtype: bool
+                """
+                return _accepts_gzip(self.headers.get('Accept-Encoding'))
+
+            def handle_job(self, session, new, parts, query_params):
+                """Start a job, or report on or cancel a job of <session>.
+
+                <parts> are the parts of the path after /jobs/. A
+                browser with no game (<session> None) has no jobs.
+
+                @type self: GameRequestHandler
+                @type session: _Session | None
+                @type new: bool
+                @type parts: list[str]
+                @type query_params: dict[str, list[str]]
+                @rtype: None
+                """
+                if parts == ['new']:
                     action = query_params.get('action', [''])[0]
-                    val = self.handle_action(action).replace('\n', '<br>')
-                    self.wfile.write(bytes(val, 'UTF-8'))
+                    try:
+                        job_id, job = session.start_job(action)
+                    except ValueError as e:
+                        self.send_json(session, new, {'error': str(e)}, 400)
+                        return
+                    self.send_json(session, new, _progress(job_id, job))
+                    return
+                job = None
+                if session is not None and len(parts) <= 2:
+                    job = session.job(parts[0])
+                if job is None:
+                    self.send_json(session, new, {'error': 'No such job!'},
+                                   404)
+                elif len(parts) == 1:
+                    try:
+                        since = int(query_params.get('since', ['0'])[0])
+                    except ValueError:
+                        since = 0
+                    self.send_json(session, new,
+                                   _progress(parts[0], job, max(since, 0)))
+                elif parts[1] == 'cancel':
+                    job.cancel()
+                    self.send_json(session, new, _progress(parts[0], job))
+                elif parts[1] == 'events':
+                    self.stream_job(session, new, parts[0], job)
                 else:
-                    with open('game.html') as f:
-                        self.wfile.write(bytes(f.read(), 'UTF-8'))
+                    self.send_json(session, new, {'error': 'No such job!'},
+                                   404)
+
+            def stream_job(self, session, new, job_id, job):
+                """Send the solutions and progress of <job> as
+                Server-Sent Events until it ends.
+
+                @type self: GameRequestHandler
+                @type session: _Session
+                @type new: bool
+                @type job_id: str
+                @type job: SolveJob
+                @rtype: None
+                """
+                headers = [('Cache-Control', 'no-cache')]
+                if self.can_chunk():
+                    headers.append(('Transfer-Encoding', 'chunked'))
+                self.start_response(session, new, 'text/event-stream',
+                                    headers)
+                seen = 0
+                while True:
+                    job.wait_for_change(seen, EVENT_INTERVAL)
+                    # Once it has ended, no solution can be missed
+                    finished = job.finished()
+                    solutions = list(job.solutions)
+                    for state in solutions[seen:]:
+                        self.write_chunk(_event('solution', str(state)))
+                    seen = len(solutions)
+                    progress = json.dumps(_progress(job_id, job))
+                    if finished:
+                        self.write_chunk(_event('done', progress))
+                        break
+                    self.write_chunk(_event('progress', progress))
+                self.write_chunk(b'')
+
+            def send_json(self, session, new, data, status=200):
+                """Send <data> as a JSON response, gzipped if it is long.
+
+                @type self: GameRequestHandler
+                @type session: _Session | None
+                @type new: bool
+                @type data: dict
+                @type status: int
+                @rtype: None
+                """
+                body = bytes(json.dumps(data), 'UTF-8')
+                self.send_pieces(session, new, 'application/json',
+                                 iter([body]), status)
+
+            def start_response(self, session, new, content_type, headers,
+                               status=200):
+                """Send the status line and the headers of a response.
+
+                @type self: GameRequestHandler
+                @type session: _Session | None
+                @type new: bool
+                @type content_type: str
+                @type headers: list[(str, object)]
+                @type status: int
+                @rtype: None
+                """
+                self.send_response(status)
+                self.send_header('Content-type', content_type)
+                for name, value in headers:
+                    self.send_header(name, value)
+                # An HTTP/1.0 client may ask for keep-alive, but cannot
+                # tell where a response without a length ends
+                if not self.can_chunk():
+                    self.send_header('Connection', 'close')
+                # Give a new browser its session id
+                if new:
+                    self.send_header('Set-Cookie', '{}={}; Path=/'.format(
+                        SESSION_COOKIE, session.id))
+                self.end_headers()
+
+            def write_chunk(self, data):
+                """Send <data> as one chunk of a chunked response; empty
+                <data> ends the response.
 
-            def handle_action(self, action):
-                """Helper which calls controller actions based on query param.
+                An HTTP/1.0 client gets <data> as it is, and the end of
+                the response is the end of the connection.
 
                 @type self: GameRequestHandler
-                @type action: str
-                @rtype: str
+                @type data: bytes
+                @rtype: None
                 """
-                print(GameRequestHandler.done)
-                if not GameRequestHandler.done:
-                    msg, should_quit = thisview._controller.act(action.strip())
-                    GameRequestHandler.done = should_quit
-                    return msg
+                if self.can_chunk():
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
                 else:
-                    return ''
+                    self.wfile.write(data)
+                self.wfile.flush()
 
-        httpd = socketserver.TCPServer(('', 8000), GameRequestHandler)
+        return _ThreadingHTTPServer(('', self._port), GameRequestHandler)
+
+    def run(self):
+        """Start the game with a web view."""
+        httpd = self.server()
         print('Server running!')
-        print('Open a web browser and go to "http://localhost:8000"')
-        httpd.serve_forever()
+        print('Open a web browser and go to "http://localhost:{}"'.format(
+            httpd.server_address[1]))
+        with ProcessPoolExecutor(self._workers) as executor:
+            self._executor = executor
+            try:
+                httpd.serve_forever()
+            finally:
+                httpd.server_close()
+                self._executor = None
+
+
+class _Session:
+    """One browser's game in a web view.
+
+    Actions of the same game are run one at a time, in order.
+    """
+    # === Attributes ===
+    # @type id: str
+    #     The session id, sent to the browser in a cookie
+    # === Private attributes ===
+    # @type _controller: Controller
+    #     The controller of this game
+    # @type _done: bool
+    #     Whether the game has ended
+    # @type _lock: threading.Lock
+    #     Held while an action runs
+    # @type _jobs: OrderedDict[str, SolveJob]
+    #     The solve jobs of this game, from oldest to newest
+
+    def __init__(self, session_id, controller):
+        """Create a new game.
+
+        @type self: _Session
+        @type session_id: str
+        @type controller: Controller
+        @rtype: None
+        """
+        self.id = session_id
+        self._controller = controller
+        self._done = False
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def act_stream(self, action):
+        """Yield the pieces of the message of <action>; nothing happens
+        once the game has ended.
+
+        @type self: _Session
+        @type action: str
+        @rtype: iterator[str]
+        """
+        with self._lock:
+            if self._done:
+                yield ''
+                return
+            chunks, should_quit = self._controller.act_stream(action.strip())
+            for chunk in chunks:
+                yield chunk
+            self._done = should_quit()
+
+    def act_batch(self, actions):
+        """Run <actions> in order, and return their results as data which
+        can be written as JSON; actions after the game ends are not run.
+
+        @type self: _Session
+        @type actions: list[str]
+        @rtype: dict
+        """
+        with self._lock:
+            results = []
+            for action in actions:
+                if self._done:
+                    break
+                result = self._controller.act_data(action.strip())
+                self._done = result['should_quit']
+                results.append(result)
+            return {'results': results, 'done': self._done}
+
+    def start_job(self, action):
+        """Start a solve job for <action> on the current state, and return
+        its id and the job.
+
+        Raise a ValueError if <action> cannot run as a job, or if the
+        game has ended.
+
+        @type self: _Session
+        @type action: str
+        @rtype: (str, SolveJob)
+        """
+        with self._lock:
+            if self._done:
+                raise ValueError('The game has ended!')
+            job = self._controller.start_job(action.strip())
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = job
+            if len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)[1].cancel()
+            return job_id, job
+
+    def job(self, job_id):
+        """Return the job of this game with id <job_id>, or None.
+
+        @type self: _Session
+        @type job_id: str
+        @rtype: SolveJob | None
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class _Asset:
+    """A static file kept in memory."""
+    # === Attributes ===
+    # @type body: bytes
+    #     The contents of the file
+    # @type gzipped: bytes
+    #     The contents, gzipped
+    # @type mtime: float
+    #     When the file was last modified, as a timestamp
+    # @type etag: str
+    #     The entity tag of this version of the file
+    # @type last_modified: str
+    #     The mtime, formatted for HTTP headers
+
+    def __init__(self, body, mtime):
+        """Keep the contents <body> of a file last modified at <mtime>.
+
+        @type self: _Asset
+        @type body: bytes
+        @type mtime: float
+        @rtype: None
+        """
+        self.body = body
+        self.gzipped = gzip.compress(body)
+        self.mtime = mtime
+        # A weak tag, since the plain and the gzipped body share it
+        self.etag = 'W/"{}"'.format(hashlib.sha1(body).hexdigest())
+        self.last_modified = formatdate(mtime, usegmt=True)
+
+    def matches(self, if_none_match, if_modified_since):
+        """Return whether a browser which sent the If-None-Match header
+        <if_none_match> and the If-Modified-Since header
+        <if_modified_since> already has this version of the file.
+
+        If-Modified-Since is only used when there is no If-None-Match.
+
+        @type self: _Asset
+        @type if_none_match: str | None
+        @type if_modified_since: str | None
+        @rtype: bool
+
+        >>> asset = _Asset(b'<html></html>', 0)
+        >>> asset.matches(asset.etag, None), asset.matches('"x"', None)
+        (True, False)
+        >>> asset.matches(None, 'Thu, 01 Jan 1970 00:00:00 GMT')
+        True
+        >>> asset.matches(None, 'yesterday')
+        False
+        """
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or _strong(self.etag) in map(_strong, tags)
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            # HTTP dates have no fractions of seconds
+            return int(self.mtime) <= since
+        return False
+
+
+def _strong(tag):
+    """Return the entity tag <tag> without its weakness mark, if any.
+
+    @type tag: str
+    @rtype: str
+    """
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def _accepts_gzip(accept_encoding):
+    """Return whether the Accept-Encoding header <accept_encoding>
+    allows gzipped responses.
+
+    @type accept_encoding: str | None
+    @rtype: bool
+
+    >>> _accepts_gzip('gzip, deflate'), _accepts_gzip('gzip;q=0')
+    (True, False)
+    >>> _accepts_gzip('identity'), _accepts_gzip(None)
+    (False, False)
+    """
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            # The quality is 1 unless the browser says otherwise
+            quality = 1.0
+            for param in params.split(';'):
+                key, _, value = param.strip().partition('=')
+                if key == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            return quality > 0
+    return False
+
+
+def _html_pieces(chunks):
+    """Yield the pieces of a message as HTML, one line per piece.
+
+    @type chunks: iterator[str]
+    @rtype: iterator[bytes]
+
+    >>> list(_html_pieces(iter(['a\\nb', 'c'])))
+    [b'a<br>b', b'<br>c']
+    """
+    for i, chunk in enumerate(chunks):
+        val = chunk.replace('\n', '<br>')
+        if i > 0:
+            val = '<br>' + val
+        yield bytes(val, 'UTF-8')
+
+
+def _progress(job_id, job, since=None):
+    """Return the progress of <job> as a JSON object.
+
+    If <since> is not None, the solutions found after the first <since>
+    are included.
+
+    @type job_id: str
+    @type job: SolveJob
+    @type since: int | None
+    @rtype: dict
+    """
+    # Read the status first, so no solution found before it ended is missed
+    status, message = job.status, job.message
+    solutions = list(job.solutions)
+    # A puzzle's own algorithm counts steps rather than states
+    result = {'id': job_id, 'status': status, 'message': message,
+              'nodes': job.stats.nodes + job.stats.steps,
+              'found': len(solutions)}
+    if since is not None:
+        result['solutions'] = [str(state) for state in solutions[since:]]
+    return result
+
+
+def _event(name, data):
+    """Return the Server-Sent Event <name> carrying the text <data>.
+
+    @type name: str
+    @type data: str
+    @rtype: bytes
+
+    >>> _event('solution', 'ye\\nbe')
+    b'event: solution\\ndata: ye\\ndata: be\\n\\n'
+    """
+    lines = ''.join('data: ' + line + '\n' for line in data.split('\n'))
+    return bytes('event: ' + name + '\n' + lines + '\n', 'UTF-8')
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           http.server.HTTPServer):
+    """An HTTP server which handles each connection on its own thread."""
+    daemon_threads = True
+    allow_reuse_address = True
@@ -42,20 +42,242 @@ Implementation details:
   in the ladder. This way, in the 'extensions' method you can just
   return the possible new words which haven't already been used.
 """
+import os
 from puzzle import Puzzle
 
 
-CHARS = 'abcdefghijklmnopqrstuvwyz'
+WORDS_FILE = 'wordsEn.txt'
+
+
+class WordDictionary:
+    """A set of allowed English words read lazily from a word file.
+
+    The file is only opened the first time a word is looked up, so
+    creating a dictionary is cheap. Use WordDictionary.shared to get the
+    process-wide dictionary for a file, which every WordLadderPuzzle
+    built from that file refers to instead of owning its own copy.
+
+    Words one letter apart are found through an index of wildcard
+    patterns: the pattern 'c_re' groups 'care', 'core', 'cure', ...
+    The index for a word length is built the first time a word of
+    that length is looked up.
+    """
+    # === Private attributes ===
+    # @type _path: str | None
+    #     The word file to read, or None if the words were given directly
+    # @type _words: set[str] | None
+    #     The allowed words, or None if they have not been read yet
+    # @type _buckets: dict[int, dict[str, list[str]]]
+    #     For each indexed word length, the words matching each pattern
+    # @type _ladder_index: LadderIndex | None
+    #     The precomputed components and distances of the words, if any
+    _shared = {}
+
+    def __init__(self, path=WORDS_FILE, words=None):
+        """Create a new dictionary for the word file <path>.
+
+        If <words> is given, the dictionary holds exactly those words
+        and <path> is never read. This is mainly useful in tests.
+
+        @type self: WordDictionary
+        @type path: str | None
+        @type words: list[str] | None
+        @rtype: None
+
+        >>> d = WordDictionary(words=['mare', 'care'])
+        >>> 'care' in d
+        True
+        >>> len(d)
+        2
+        """
+        # if the words are given, there is nothing to load later
+        if words is not None:
+            self._path = None
+            self._words = set(words)
+        # otherwise the file is read on first use
+        else:
+            self._path = path
+            self._words = None
+        # no word length is indexed yet
+        self._buckets = {}
+        # there is no precomputed ladder index until one is set
+        self._ladder_index = None
+
+    @classmethod
+    def shared(cls, path=WORDS_FILE):
+        """Return the process-wide dictionary for the word file <path>.
+
+        The same object is returned for every spelling of the same path.
+
+        @type cls: type
+        @type path: str
+        @rtype: WordDictionary
+
+        >>> WordDictionary.shared() is WordDictionary.shared('./wordsEn.txt')
+        True
+        """
+        # key the dictionaries by absolute path
+        key = os.path.abspath(path)
+        # if there is no dictionary for this file yet
+        if key not in cls._shared:
+            # create one, which is loaded on first use
+            cls._shared[key] = cls(path)
+        return cls._shared[key]
+
+    def __reduce__(self):
+        """Return how to pickle this dictionary.
+
+        A dictionary read from a file is pickled as the path of the file,
+        so that sending a puzzle to another process does not send every
+        word. There it becomes the shared dictionary for that file if it
+        was one here.
+
+        @type self: WordDictionary
+        @rtype: tuple
+
+        >>> import pickle
+        >>> d = pickle.loads(pickle.dumps(WordDictionary.shared()))
+        >>> d is WordDictionary.shared()
+        True
+        >>> d = pickle.loads(pickle.dumps(WordDictionary(words=['mare'])))
+        >>> list(d)
+        ['mare']
+        """
+        # if the words were given directly, they must be sent
+        if self._path is None:
+            return WordDictionary, (None, sorted(self._words))
+        key = os.path.abspath(self._path)
+        # if it is the shared dictionary of its file
+        if WordDictionary._shared.get(key) is self:
+            return WordDictionary.shared, (key,)
+        return WordDictionary, (key,)
+
+    def __contains__(self, word):
+        """Return whether <word> is an allowed word.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: bool
+        """
+        return word in self._load()
+
+    def __iter__(self):
+        """Return an iterator over the allowed words.
+
+        @type self: WordDictionary
+        @rtype: iterator[str]
+        """
+        return iter(self._load())
+
+    def __len__(self):
+        """Return the number of allowed words.
+
+        @type self: WordDictionary
+        @rtype: int
+        """
+        return len(self._load())
+
+    def ladder_index(self):
+        """Return the precomputed ladder index of this dictionary, or None.
+
+        @type self: WordDictionary
+        @rtype: LadderIndex | None
+        """
+        return self._ladder_index
+
+    def set_ladder_index(self, index):
+        """Use <index> to answer ladder queries on this dictionary.
+
+        <index> must have been built from the same words; see
+        ladder_index.py. It is not pickled with the dictionary, so each
+        process must set it on its own shared dictionary.
+
+        @type self: WordDictionary
+        @type index: LadderIndex | None
+        @rtype: None
+        """
+        self._ladder_index = index
+
+    def neighbours(self, word):
+        """Return the allowed words that differ from <word> in one letter.
+
+        <word> itself need not be an allowed word.
+        The returned list is in no particular order.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: list[str]
+
+        >>> d = WordDictionary(words=['mare', 'care', 'mire', 'mars', 'cars'])
+        >>> sorted(d.neighbours('mare'))
+        ['care', 'mars', 'mire']
+        >>> sorted(d.neighbours('more'))
+        ['mare', 'mire']
+        """
+        # get the index for words of this length
+        buckets = self._index(len(word))
+        # create a new empty list as result
+        result = []
+        # loop the patterns of the word
+        for pattern in _patterns(word):
+            # loop the words sharing this pattern
+            for other in buckets.get(pattern, []):
+                # if it is not the word itself
+                if other != word:
+                    # add it to the result
+                    result.append(other)
+        return result
+
+    def _index(self, length):
+        """Return the pattern index for words of length <length>.
+
+        @type self: WordDictionary
+        @type length: int
+        @rtype: dict[str, list[str]]
+        """
+        # if this length has not been indexed yet
+        if length not in self._buckets:
+            buckets = {}
+            # loop the words of this length
+            for word in self._load():
+                if len(word) == length:
+                    # add the word to the bucket of each of its patterns
+                    for pattern in _patterns(word):
+                        buckets.setdefault(pattern, []).append(word)
+            self._buckets[length] = buckets
+        return self._buckets[length]
+
+    def _load(self):
+        """Return the set of allowed words, reading the file if needed.
+
+        @type self: WordDictionary
+        @rtype: set[str]
+        """
+        # if the words have not been read yet
+        if self._words is None:
+            # read them once from the word file
+            with open(self._path) as wordfile:
+                self._words = set(line.strip() for line in wordfile)
+        return self._words
+
+
+def _patterns(word):
+    """Return the wildcard patterns of <word>, one per letter.
+
+    @type word: str
+    @rtype: list[str]
+
+    >>> _patterns('care')
+    ['_are', 'c_re', 'ca_e', 'car_']
+    """
+    return [word[:i] + '_' + word[i + 1:] for i in range(len(word))]
 
 
 class WordLadderPuzzle(Puzzle):
     """A word ladder puzzle."""
-    # TODO: add to this list of private attributes!
     # === Private attributes ===
-    # @type _words: list[str]
-    #     List of allowed English words
-    # @type _hashed_words: set(list[str])
-    #     set of list of allowed English words
+    # @type _dictionary: WordDictionary
+    #     The allowed English words, shared with other puzzles
     # @type _start: str
     #     start word
     # @type _target: str
@@ -63,28 +285,28 @@ class WordLadderPuzzle(Puzzle):
     # @type _hist: list
     #     list of hist
 
-    def __init__(self, start, target, hist=[]):
+    def __init__(self, start, target, hist=[], dictionary=None):
         """Create a new word ladder puzzle with given start and target words.
 
         Note: you may add OPTIONAL arguments to this constructor,
         but you may not change the purpose of <start> and <target>.
 
+        If <dictionary> is None, the shared dictionary for wordsEn.txt
+        is used.
+
         @type self: WordLadderPuzzle
         @type start: str
         @type target: str
         @type hist: list
+        @type dictionary: WordDictionary | None
         @rtype: None
         """
-        # Code to initialize _words - you don't need to change this.
-        self._words = []
-        with open('wordsEn.txt') as wordfile:
-            for line in wordfile:
-                self._words.append(line.strip())
-
-        # TODO: Complete the constructor.
-
-        # initialize the hashed words as the set of _words
-        self._hashed_words = set(self._words)
+        # if no dictionary is given
+        if dictionary is None:
+            # use the shared dictionary of the default word file
+            dictionary = WordDictionary.shared()
+        # initialize the dictionary of allowed words
+        self._dictionary = dictionary
         # initialize the start word
         self._start = start
         # initialize the target word
@@ -133,7 +355,7 @@ class WordLadderPuzzle(Puzzle):
 
         The valid move must change exactly one character of the
         current word, and must result in an English word stored in
-        self._words.
+        self._dictionary.
 
         You should *not* perform any moves which produce a word
         that is already in the ladder.
@@ -224,25 +446,43 @@ class WordLadderPuzzle(Puzzle):
         if state_new in self._hist:
             # raise the value error
             raise ValueError('Repetitive word found!')
-        # define the number of changes started with 0
-        n_changes = 0
-        # loop the length of state
-        for index in range(len(state)):
-            # if the state is not equal to the new state in the current index
-            if state[index] != state_new[index]:
-                # number of changes add 1
-                n_changes += 1
-        # if the number of changes do not happen just once
-        if n_changes != 1:
-            # raise the value error
-            raise ValueError('Incorrect number of changed letters!')
-        # if the new state is not in the hashed words
-        if state_new not in self._hashed_words:
-            # raise the value error
+        # if the new state is not a word one letter away from the state
+        if state_new not in self._dictionary.neighbours(state):
+            # define the number of changes started with 0
+            n_changes = 0
+            # loop the length of state
+            for index in range(len(state)):
+                # if the state is not equal to the new state in the index
+                if state[index] != state_new[index]:
+                    # number of changes add 1
+                    n_changes += 1
+            # if the number of changes do not happen just once
+            if n_changes != 1:
+                # raise the value error
+                raise ValueError('Incorrect number of changed letters!')
+            # otherwise the new state is not in the dictionary
             raise ValueError('Illegal word!')
         # return the puzzle after given moves
         return self._extend(state_new)
 
+    def key(self):
+        """Return a hashable value identifying this puzzle state.
+
+        What can still be done only depends on the target, the current
+        word and the set of words already used, so ladders using the same
+        words in a different order have equal keys.
+
+        @type self: WordLadderPuzzle
+        @rtype: (str, str, frozenset[str])
+
+        >>> w = WordLadderPuzzle('ye', 'ac', ['ye', 'be', 'he', 'me'])
+        >>> w == WordLadderPuzzle('ye', 'ac', ['ye', 'he', 'be', 'me'])
+        True
+        >>> w == WordLadderPuzzle('ye', 'ac', ['ye', 'be', 'me', 'he'])
+        False
+        """
+        return self._target, self._hist[-1], frozenset(self._hist)
+
     def compare(self, state):
         """Return a move obtained by comparing with <state>
         or None if no differences found
@@ -260,47 +500,242 @@ class WordLadderPuzzle(Puzzle):
         """
         return state._hist[-1]
 
+    def to_data(self):
+        """Return the words of the ladder so far and the target word,
+        for JSON.
+
+        @type self: WordLadderPuzzle
+        @rtype: dict[str, list[str] | str]
+
+        >>> WordLadderPuzzle('ye', 'ac', ['ye', 'be']).to_data()
+        {'words': ['ye', 'be'], 'target': 'ac'}
+        """
+        return {'words': list(self._hist), 'target': self._target}
+
+    def heuristic(self):
+        """Return the number of letters of the current word which differ
+        from the target word.
+
+        Each move changes one letter, so at least that many moves are
+        left. If the dictionary has a ladder index, its lower bound is
+        used instead when it is higher. Return float('inf') if the target
+        cannot be reached at all.
+
+        @type self: WordLadderPuzzle
+        @rtype: float
+
+        >>> WordLadderPuzzle('cold', 'warm').heuristic()
+        4
+        >>> WordLadderPuzzle('ye', 'acs').heuristic()
+        inf
+        """
+        word, target = self._hist[-1], self._target
+        if word == target:
+            return 0
+        # if the target has another length, is not a legal word, or was
+        # used earlier
+        if (len(word) != len(target) or target not in self._dictionary or
+                target in self._hist):
+            return float('inf')
+        distance = sum(1 for a, b in zip(word, target) if a != b)
+        # a precomputed index may know better
+        index = self._dictionary.ladder_index()
+        if index is not None:
+            distance = max(distance, index.lower_bound(word, target))
+        return distance
+
+    def direct_solve(self, spend=None):
+        """Return the shortest ladder from <self> to the target word.
+
+        This is what solver.solve uses for word ladders when asked for
+        a direct solution; see shortest_ladder. <spend> is called for
+        each word the search goes through, and may raise an exception to
+        stop it.
+
+        @type self: WordLadderPuzzle
+        @type spend: function | None
+        @rtype: WordLadderPuzzle | None
+
+        >>> steps = []
+        >>> print(WordLadderPuzzle('ye', 'ac').direct_solve( \
+        lambda: steps.append(1)))
+        ye de dc ac
+        >>> len(steps) > 0
+        True
+        """
+        # take the first ladder found, if there is one
+        for ladder in self._shortest_ladders(spend):
+            return ladder
+        return None
+
+    def shortest_ladder(self):
+        """Return a shortest ladder from <self> to the target word.
+
+        The returned puzzle is solved and its history starts with the
+        history of <self>. Among the shortest ladders, the alphabetically
+        first one is returned. Return None if the target cannot be reached.
+
+        @type self: WordLadderPuzzle
+        @rtype: WordLadderPuzzle | None
+
+        >>> w = WordLadderPuzzle('ye', 'ac')
+        >>> print(w.shortest_ladder())
+        ye de dc ac
+        >>> w = WordLadderPuzzle('ye', 'ac', ['ye', 'be'])
+        >>> print(w.shortest_ladder())
+        ye be bb ab ac
+        >>> print(WordLadderPuzzle('aaaaaaaaaaa', 'ac').shortest_ladder())
+        None
+        """
+        # take the first ladder found, if there is one
+        for ladder in self._shortest_ladders():
+            return ladder
+        return None
+
+    def all_shortest_ladders(self):
+        """Return all shortest ladders from <self> to the target word.
+
+        The ladders are sorted in alphabetical order. Return an empty
+        list if the target cannot be reached.
+
+        @type self: WordLadderPuzzle
+        @rtype: list[WordLadderPuzzle]
+
+        >>> w = WordLadderPuzzle('cold', 'warm')
+        >>> for ladder in w.all_shortest_ladders():
+        ...     print(ladder)
+        cold cord card ward warm
+        cold cord corm worm warm
+        cold cord word ward warm
+        cold cord word worm warm
+        cold wold word ward warm
+        cold wold word worm warm
+        """
+        return list(self._shortest_ladders())
+
+    # ------------------------------------------------------------------------
+    # Helpers for shortest ladders
+    # ------------------------------------------------------------------------
+    def _shortest_ladders(self, spend=None):
+        """Yield the shortest ladders from <self> in alphabetical order.
+
+        <spend> is called for each word a search goes through, if given.
+
+        @type self: WordLadderPuzzle
+        @type spend: function | None
+        @rtype: iterator[WordLadderPuzzle]
+        """
+        # if the puzzle has been solved, it is its own shortest ladder
+        if self.is_solved():
+            yield self
+            return
+        # get the next words on shortest ladders from each word
+        tree = self._ladder_tree(spend)
+        # create a stack of the partial ladders, starting at the current word
+        stack = [[self._hist[-1]]]
+        while stack:
+            path = stack.pop()
+            if spend is not None:
+                spend()
+            # if the partial ladder reaches the target
+            if path[-1] == self._target:
+                # extend the history by the words after the current one
+                yield WordLadderPuzzle(self._start, self._target,
+                                       self._hist + path[1:],
+                                       self._dictionary)
+            else:
+                # push the longer ladders, the alphabetically first on top
+                for word in sorted(tree.get(path[-1], []), reverse=True):
+                    stack.append(path + [word])
+
+    def _ladder_tree(self, spend=None):
+        """Return the next words on shortest ladders to the target.
+
+        Run a breadth-first search from the current word and from the
+        target at the same time, always growing the smaller frontier by
+        one level, until the two frontiers meet. Words already in the
+        ladder are never used again.
+
+        The result maps a word to the words that can follow it on
+        a shortest ladder. It maps nothing if there is no ladder.
+        <spend> is called for each word of a frontier, if given.
+
+        @type self: WordLadderPuzzle
+        @type spend: function | None
+        @rtype: dict[str, set[str]]
+        """
+        tree = {}
+        start, target = self._hist[-1], self._target
+        # if the target is not a legal word, or was used earlier
+        if (len(start) != len(target) or target not in self._dictionary or
+                target in self._hist):
+            return tree
+        # if a precomputed index shows they are not connected at all
+        index = self._dictionary.ladder_index()
+        if index is not None and not index.reachable(start, target):
+            return tree
+        # the words which cannot be added to a frontier any more
+        visited = set(self._hist) | {target}
+        # the frontiers from the start and from the target
+        front, back = {start}, {target}
+        # whether <front> is the frontier from the start
+        forward = True
+        found = False
+        while front and back and not found:
+            # always grow the smaller frontier
+            if len(front) > len(back):
+                front, back, forward = back, front, not forward
+            level = set()
+            # loop the words of the frontier
+            for word in front:
+                if spend is not None:
+                    spend()
+                # loop the words one letter away
+                for other in self._dictionary.neighbours(word):
+                    # if the frontiers meet here
+                    if other in back:
+                        found = True
+                    # if it is a new word, it belongs to the next level
+                    elif other not in visited:
+                        level.add(other)
+                    # otherwise it is not on any new shortest ladder
+                    else:
+                        continue
+                    # record the link in the direction of the target
+                    if forward:
+                        tree.setdefault(word, set()).add(other)
+                    else:
+                        tree.setdefault(other, set()).add(word)
+            visited |= level
+            front = level
+        # if the frontiers never met, there is no ladder
+        if not found:
+            return {}
+        return tree
+
     # ------------------------------------------------------------------------
     # Helpers for method 'extensions'
     # ------------------------------------------------------------------------
     def _possible_words(self):
-        """Return a list of the possible letters for a position.
+        """Return a list of the possible words after one move.
 
-        The returned letters must be a subset of the available letters.
+        The returned words are one letter away from the current word
+        and are not already in the ladder.
         The returned list should be sorted in alphabetical order.
 
         @type self: WordLadderPuzzle
-        @type index: int
         @rtype: list[str]
 
         >>> w = WordLadderPuzzle('ye', 'ac')
         >>> w._possible_words()
         ['be', 'de', 'he', 'ie', 'me', 'ne', 're', 'se', 'we', 'yr']
         """
-        # get the acaliable words
-        avaliable = self._hashed_words - set(self._hist[:-1])
-        # get the final state in the hist
-        state = list(self._hist[-1])
-        # create a new empty list as result
-        result = []
-        # loop the length of the puzzle state
-        for index in range(len(state)):
-            # get the letters in the state
-            letters = set(CHARS) - set([state[index]])
-            # loop the letters
-            for let in letters:
-                # define a new state as the list of the current state
-                state_new = list(state)
-                # change the new state to the letter at the index position
-                state_new[index] = let
-                state_new = ''.join(state_new)
-                # if the new state is in the avaliable words
-                if state_new in avaliable:
-                    # add it to the result
-                    result.append(state_new)
-
-        # return the sorted result
-        return sorted(result)
+        # get the words already used in the ladder
+        used = set(self._hist[:-1])
+        # keep the neighbours of the current word which are not used yet
+        # and return them sorted
+        return sorted(word for word in self._dictionary.neighbours(
+            self._hist[-1]) if word not in used)
 
     def _extend(self, state):
         """Return a new word ladder obtained after one move.
@@ -319,7 +754,7 @@ class WordLadderPuzzle(Puzzle):
         ye be
         """
         return WordLadderPuzzle(
-            self._start, self._target, self._hist + [state])
+            self._start, self._target, self._hist + [state], self._dictionary)
 
 
 if __name__ == '__main__':